@@ -1,22 +1,70 @@
 from fastapi import FastAPI, Form, UploadFile, File, HTTPException, Path
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Union
+from typing import Optional, List, Dict, Tuple, Union
 import os
-import pandas as pd
+import json
+import asyncio
 from dotenv import load_dotenv
 from modules.supabase_client import supabase
-from modules.vector import initialize_vector_db_for_session
+from modules.vector import embeddings, initialize_vector_db_for_session, batch_retrieve
 from datetime import datetime
 import uuid
+import time
 from modules.sentiment_analysis import analyze_session_sentiment
-from groq import Groq
+from modules.metrics import (
+    AUDIO_BYTES,
+    AUDIO_SECONDS_TRIMMED,
+    TRANSCRIPTION_SECONDS_SAVED,
+    RequestTracingMiddleware,
+    render_metrics,
+    span,
+)
+from modules.profiling import ProfilingMiddleware, profiling_enabled
+from modules.lazy import LazyClient
+from modules.audio import (
+    AudioUploadError,
+    UploadLimitMiddleware,
+    decode_audio,
+    extract_speech_prefix,
+    get_upload_buffer,
+    normalize_audio,
+)
+from modules.speculation import SpeculativeRetriever, submit_in_slot
+from modules.language_id import reply_language
+from modules.admission import BATCH, TEXT, VOICE, assistant_limiter, slot
+from modules.llm import LLMDeadlineExceeded, complete
+from modules.prompts import prompt_registry
+from modules.sessions import register_context
+from modules.context_store import start_maintenance_thread
 
 # Load environment
 load_dotenv()
 
 app = FastAPI(title="LenDenClub VoiceBot API", version="1.0")
 
+# Max number of concurrent LLM calls per /batch request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Max number of questions in one /batch request
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "100"))
+
+# Max number of files written/uploaded at once per /assistants/create request
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+# Downmix/resample/trim voice audio before transcription
+AUDIO_NORMALIZATION = os.getenv("AUDIO_NORMALIZATION", "1").lower() in ("1", "true", "yes")
+
+# Transcribe the utterance up to its last pause in parallel and start retrieval on it early.
+# Costs one extra (shorter) Whisper call per voice turn.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "0").lower() in ("1", "true", "yes")
+
+# Time budget for the reply to a voice turn; a caller is waiting in silence
+VOICE_LLM_DEADLINE_S = float(os.getenv("VOICE_LLM_DEADLINE_S", "8"))
+
+# 413 for oversized audio while it is still arriving, not once it is spooled (inside CORS, so browsers can read it)
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -24,47 +72,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Retry-After"],
 )
 
-# Custom Prompt Template Implementation
-class Message:
-    def __init__(self, role: str, content: str):
-        self.role = role
-        self.content = content
+# Opt-in profiling of selected requests (see modules/profiling.py)
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
 
-class CustomPromptTemplate:
-    def __init__(self, messages: List[Dict[str, str]]):
-        self.messages = [Message(**msg) for msg in messages]
-    
-    def format(self, **kwargs) -> List[Dict[str, str]]:
-        formatted_messages = []
-        for msg in self.messages:
-            try:
-                formatted_content = msg.content.format(**kwargs)
-            except KeyError as e:
-                raise ValueError(f"Missing variable {e} in prompt template")
-                
-            formatted_messages.append({
-                'role': msg.role,
-                'content': formatted_content
-            })
-        return formatted_messages
-
-def create_assistant_prompt(system_prompt: str, first_message: str, context: str = "") -> CustomPromptTemplate:
-    """Create a custom prompt template for an assistant"""
-    full_system_prompt = f"{system_prompt}\n\nContext:\n{context}" if context else system_prompt
-    return CustomPromptTemplate([
-        {'role': 'system', 'content': full_system_prompt},
-        {'role': 'human', 'content': "Hello!"},
-        {'role': 'ai', 'content': first_message},
-        {'role': 'human', 'content': "{user_input}"}
-    ])
-
-# Initialize Groq client for LLM
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-def generate_response(messages: List[Dict[str, str]], model: str = "llama3-8b-8192", language: str = "en") -> str:
-    """Generate response enforcing the specified language"""
+# Request ids + per-stage latency histograms
+app.add_middleware(RequestTracingMiddleware)
+
+# Dedup/VACUUM/eviction of Context/ stores in the background, if CONTEXT_MAINTENANCE_INTERVAL_S is set
+@app.on_event("startup")
+async def start_context_maintenance():
+    start_maintenance_thread()
+
+# Groq client for transcription, created on first use (completions go through modules/llm.py)
+def _create_groq():
+    from groq import Groq
+    return Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+groq_client = LazyClient(_create_groq)
+
+def generate_response(messages: List[Dict[str, str]], model: str = "llama3-8b-8192",
+                      deadline_s: Optional[float] = None) -> str:
+    """Generate a response to prompt messages (see modules/prompts.py) within deadline_s (default LLM_DEADLINE_S)"""
     try:
         # Convert our message format to Groq's expected format
         groq_messages = []
@@ -74,13 +106,6 @@ def generate_response(messages: List[Dict[str, str]], model: str = "llama3-8b-81
             'ai': 'assistant'
         }
         
-        # Add language instruction to the system prompt
-        if language != "en":
-            for msg in messages:
-                if msg['role'] == 'system':
-                    msg['content'] = f"{msg['content']}\n\nImportant: You must respond in {language} language only."
-                    break
-        
         for msg in messages:
             if msg['role'] not in role_mapping:
                 raise ValueError(f"Invalid role: {msg['role']}")
@@ -90,22 +115,26 @@ def generate_response(messages: List[Dict[str, str]], model: str = "llama3-8b-81
                 "content": msg['content']
             })
         
-        # For Hindi, we need to be more explicit with the instruction
-        if language == "hi":
-            groq_messages.append({
-                "role": "user",
-                "content": "कृपया हिंदी में ही उत्तर दें।"
-            })
-        
-        chat_completion = groq_client.chat.completions.create(
-            messages=groq_messages,
-            model=model,
-            temperature=0.7
-        )
-        return chat_completion.choices[0].message.content
+        return complete(groq_messages, model=model, temperature=0.7, deadline_s=deadline_s)
+    except LLMDeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise Exception(f"Error generating response: {str(e)}")
 
+def transcribe_audio(audio, filename: str, language: str) -> Tuple[str, Optional[str]]:
+    """Transcribe audio (bytes or file object) with Whisper; language "auto" lets Whisper detect it.
+
+    Returns (text, language Whisper reports, e.g. "marathi").
+    """
+    language_kwargs = {} if language == "auto" else {"language": language}
+    transcription = groq_client.audio.transcriptions.create(
+        file=(filename, audio),
+        model="whisper-large-v3-turbo",
+        response_format="verbose_json",
+        **language_kwargs,
+    )
+    return transcription.text, getattr(transcription, "language", None)
+
 # Data Models
 class SessionCreate(BaseModel):
     assistant_id: str = "lenden_assistant"
@@ -143,16 +172,6 @@ class AssistantResponse(BaseModel):
     created_at: datetime
 
 # Helper Functions
-def get_next_session_id(context_root="Context"):
-    os.makedirs(context_root, exist_ok=True)
-    existing = [d for d in os.listdir(context_root) if d.startswith("session_")]
-    nums = [int(d.split("_")[1]) for d in existing if d.split("_")[1].isdigit()]
-    next_id = max(nums, default=0) + 1
-    return f"session_{next_id}"
-
-def list_sessions(context_root="Context"):
-    return sorted([d for d in os.listdir(context_root) if d.startswith("session_")])
-
 def save_uploaded_files(files, session_id):
     upload_path = f"Context/{session_id}/docs"
     os.makedirs(upload_path, exist_ok=True)
@@ -186,46 +205,61 @@ async def create_assistant(
         
         os.makedirs(docs_dir, exist_ok=True)
         os.makedirs(db_dir, exist_ok=True)
+        register_context(f"assistant_{assistant_id}")
 
-        # 2. Handle multiple file uploads
+        # 2. Handle multiple file uploads: every file is read once, then written to the
+        # docs directory and uploaded to Supabase Storage at the same time, several files at once
         if files:
-            for file in files:
-                file_ext = os.path.splitext(file.filename)[1]
-                
-                # Save to local docs directory
-                local_file_path = f"{docs_dir}/{file.filename}"
-                with open(local_file_path, "wb") as f:
-                    f.write(await file.read())
-                
-                # Upload to Supabase Storage
-                supabase_path = f"assistant-files/uploads/{assistant_id}/{file.filename}"
-                with open(local_file_path, "rb") as f:
-                    supabase.storage.from_("assistant-files").upload(
-                        path=supabase_path,
-                        file=f.read(),
-                        file_options={"content-type": file.content_type}
+            upload_semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+            def write_file(path, data):
+                with span("file_write"), open(path, "wb") as f:
+                    f.write(data)
+
+            async def upload_file(path, data, content_type):
+                async with slot("supabase"):
+                    with span("storage_upload"):
+                        await asyncio.to_thread(
+                            supabase.storage.from_("assistant-files").upload,
+                            path=path,
+                            file=data,
+                            file_options={"content-type": content_type}
+                        )
+
+            async def store_file(file):
+                async with upload_semaphore:
+                    data = await file.read()
+                    supabase_path = f"assistant-files/uploads/{assistant_id}/{file.filename}"
+                    await asyncio.gather(
+                        asyncio.to_thread(write_file, f"{docs_dir}/{file.filename}", data),
+                        upload_file(supabase_path, data, file.content_type),
                     )
-                file_url = supabase.storage.from_("assistant-files").get_public_url(supabase_path)
-                file_urls.append(file_url)
+                    return supabase.storage.from_("assistant-files").get_public_url(supabase_path)
+
+            file_urls = list(await asyncio.gather(*(store_file(file) for file in files)))
 
             # Initialize vector DB with all uploaded files
-            initialize_vector_db_for_session(f"assistant_{assistant_id}")
+            async with slot("ollama"):
+                with span("vector_db_init"):
+                    await asyncio.to_thread(initialize_vector_db_for_session, f"assistant_{assistant_id}")
 
         # 3. Create assistant record
-        supabase.table("assistants").insert({
-            "assistant_id": assistant_id,
-            "user_id": user_id,
-            "name": name,
-            "provider": provider,
-            "model": model,
-            "voice_provider": voice_provider,
-            "voice_model": voice_model,
-            "first_message": first_message,
-            "system_prompt": system_prompt,
-            "file_urls": file_urls,
-            "created_at": created_at,
-            "vector_db_path": db_dir
-        }).execute()
+        async with slot("supabase"):
+            with span("assistant_insert"):
+                await asyncio.to_thread(supabase.table("assistants").insert({
+                    "assistant_id": assistant_id,
+                    "user_id": user_id,
+                    "name": name,
+                    "provider": provider,
+                    "model": model,
+                    "voice_provider": voice_provider,
+                    "voice_model": voice_model,
+                    "first_message": first_message,
+                    "system_prompt": system_prompt,
+                    "file_urls": file_urls,
+                    "created_at": created_at,
+                    "vector_db_path": db_dir
+                }).execute)
 
         return {
             "assistant_id": assistant_id,
@@ -242,6 +276,8 @@ async def create_assistant(
             "vector_db_path": db_dir
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error creating assistant: {str(e)}")
 
@@ -323,8 +359,14 @@ async def chat_with_agent(
         if chat_input is None or not chat_input.user_query:
             raise HTTPException(status_code=400, detail="Missing user_query")
 
+        assistant_limiter.check(assistant_id)
+
         # Fetch assistant config
-        assistant = supabase.table("assistants").select("*").eq("assistant_id", assistant_id).execute()
+        async with slot("supabase", TEXT):
+            with span("assistant_lookup"):
+                assistant = await asyncio.to_thread(
+                    supabase.table("assistants").select("*").eq("assistant_id", assistant_id).execute
+                )
         if not assistant.data:
             raise HTTPException(status_code=404, detail="Assistant not found")
         
@@ -332,28 +374,36 @@ async def chat_with_agent(
         
         # Vector retrieval
         assistant_vector_db_path = f"assistant_{assistant_id}"
-        retriever = initialize_vector_db_for_session(assistant_vector_db_path)
-        docs = retriever.invoke(chat_input.user_query)
+        async with slot("ollama", TEXT):
+            with span("vector_db_init"):
+                retriever = await asyncio.to_thread(initialize_vector_db_for_session, assistant_vector_db_path)
+            with span("retrieval"):
+                docs = await asyncio.to_thread(retriever.invoke, chat_input.user_query)
         context = "\n\n".join([doc.page_content for doc in docs]) if docs else ""
 
-        # Create and format prompt
-        prompt = create_assistant_prompt(
-            system_prompt=assistant_config.get("system_prompt", ""),
-            first_message=assistant_config.get("first_message", ""),
-            context=context
-        )
-        messages = prompt.format(user_input=chat_input.user_query)
+        # Reuse the assistant's compiled prompt prefix, append context and the query
+        with span("prompt_build"):
+            prompt = prompt_registry.get(
+                assistant_id,
+                system_prompt=assistant_config.get("system_prompt", ""),
+                first_message=assistant_config.get("first_message", "")
+            )
+            messages = prompt.build(chat_input.user_query, context=context)
         
         # Generate response
-        bot_response = generate_response(messages)
+        async with slot("groq", TEXT):
+            with span("llm"):
+                bot_response = await asyncio.to_thread(generate_response, messages)
 
         # Store conversation
-        supabase.table("chat_history").insert({
-            "session_id": session_id,
-            "user_query": chat_input.user_query,
-            "bot_response": bot_response,
-            "assistant_id": assistant_id
-        }).execute()
+        async with slot("supabase", TEXT):
+            with span("history_insert"):
+                await asyncio.to_thread(supabase.table("chat_history").insert({
+                    "session_id": session_id,
+                    "user_query": chat_input.user_query,
+                    "bot_response": bot_response,
+                    "assistant_id": assistant_id
+                }).execute)
 
         return {
             "response": bot_response,
@@ -362,6 +412,8 @@ async def chat_with_agent(
             "vector_db_used": assistant_vector_db_path
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in chat: {str(e)}")
 
@@ -370,12 +422,18 @@ async def voice_chat_with_agent(
     assistant_id: str = Path(...),
     session_id: str = Path(...),
     audio_file: UploadFile = File(...),
-    language: str = Form("hi")  # Default to Hindi now
+    language: str = Form("auto")  # Transcription hint; the reply follows the language actually spoken
 ):
-    """Unified endpoint: audio + language → transcription → context retrieval → response"""
+    """Unified endpoint: audio (+ optional language hint) → transcription → language detection → context retrieval → response"""
     try:
+        assistant_limiter.check(assistant_id)
+
         # Step 0: Fetch assistant configuration
-        assistant = supabase.table("assistants").select("*").eq("assistant_id", assistant_id).execute()
+        async with slot("supabase", VOICE):
+            with span("assistant_lookup"):
+                assistant = await asyncio.to_thread(
+                    supabase.table("assistants").select("*").eq("assistant_id", assistant_id).execute
+                )
         if not assistant.data:
             raise HTTPException(status_code=404, detail="Assistant not found")
         
@@ -383,85 +441,235 @@ async def voice_chat_with_agent(
         system_prompt = assistant_config.get("system_prompt", "")
         first_message = assistant_config.get("first_message", "")
         
-        # Step 1: Save uploaded audio temporarily
-        temp_audio_path = f"temp_{uuid.uuid4()}.wav"
-        with open(temp_audio_path, "wb") as f:
-            f.write(await audio_file.read())
-
-        # Step 2: Transcribe with Whisper (using provided language)
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        with open(temp_audio_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(audio_file.filename, file.read()),
-                model="whisper-large-v3-turbo",
-                language=language,
-                response_format="verbose_json",
+        # Step 1: Use the uploaded audio in place (no temp file, no extra copy)
+        try:
+            audio_buffer = get_upload_buffer(audio_file)
+        except AudioUploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+
+        # Step 1b: Mono, up to 16 kHz, silence trimmed, compact encoding (decoded once, also used for speculation)
+        audio_filename, audio_stats, segment = audio_file.filename, None, None
+        if AUDIO_NORMALIZATION or SPECULATIVE_RETRIEVAL:
+            try:
+                with span("audio_preprocess"):
+                    segment = await asyncio.to_thread(decode_audio, audio_buffer, audio_file.filename)
+                    if AUDIO_NORMALIZATION:
+                        audio_buffer, audio_filename, audio_stats = await asyncio.to_thread(
+                            normalize_audio, audio_buffer, audio_file.filename, segment
+                        )
+            except Exception as e:
+                # Undecodable here (e.g. no ffmpeg for mp3): send the original bytes
+                print("❌ Error normalizing audio:", e)
+                audio_buffer, audio_filename, audio_stats = get_upload_buffer(audio_file), audio_file.filename, None
+
+        # Step 2: Transcribe with Whisper (using provided language). It starts first:
+        # speculating retrieval on the part before the last pause only runs alongside it
+        async def transcribe_full():
+            async with slot("groq", VOICE):
+                transcription_start = time.perf_counter()
+                with span("transcription"):
+                    text, spoken = await asyncio.to_thread(transcribe_audio, audio_buffer, audio_filename, language)
+                return text, spoken, time.perf_counter() - transcription_start
+
+        transcription_task = asyncio.create_task(transcribe_full())
+        assistant_vector_db_path = f"assistant_{assistant_id}"
+        retriever, speculation, speculation_outcome = None, None, None
+        prefix_task = None
+        try:
+            prefix_audio = None
+            if SPECULATIVE_RETRIEVAL and segment is not None:
+                try:
+                    prefix_audio = await asyncio.to_thread(extract_speech_prefix, segment)
+                except Exception as e:
+                    print("❌ Error splitting audio for speculation:", e)
+
+            if prefix_audio:
+                async with slot("ollama", VOICE):
+                    with span("vector_db_init"):
+                        retriever = await asyncio.to_thread(initialize_vector_db_for_session, assistant_vector_db_path)
+
+                # Each embedding and search takes an ollama slot, like any other retrieval
+                speculation = SpeculativeRetriever(
+                    embeddings.embed_query,
+                    retriever.search_by_vector,
+                    submit=submit_in_slot(lambda: slot("ollama", VOICE), asyncio.get_running_loop()),
+                )
+
+                async def speculate_on_prefix():
+                    async with slot("groq", VOICE):
+                        prefix_text, _ = await asyncio.to_thread(transcribe_audio, *prefix_audio, language)
+                    speculation.speculate(prefix_text)
+
+                prefix_task = asyncio.create_task(speculate_on_prefix())
+
+            user_query, spoken_language, transcription_seconds = await transcription_task
+        finally:
+            transcription_task.cancel()
+            if prefix_task:
+                # A prefix that arrives after the full transcript is of no use
+                prefix_task.cancel()
+
+        if audio_stats:
+            # Transcription time scales with audio length: estimate what the trimmed audio would have cost
+            trimmed_seconds = max(0.0, audio_stats["seconds_in"] - audio_stats["seconds_out"])
+            audio_stats["estimated_transcription_ms_saved"] = round(
+                transcription_seconds * trimmed_seconds / max(audio_stats["seconds_out"], 1e-3) * 1000, 2
             )
-        user_query = transcription.text
+            AUDIO_BYTES.labels("raw").observe(audio_stats["bytes_in"])
+            AUDIO_BYTES.labels("normalized").observe(audio_stats["bytes_out"])
+            AUDIO_SECONDS_TRIMMED.inc(trimmed_seconds)
+            TRANSCRIPTION_SECONDS_SAVED.inc(audio_stats["estimated_transcription_ms_saved"] / 1000)
 
-        os.remove(temp_audio_path)
+        # Reply in the language the user actually spoke
+        response_language = reply_language(user_query, spoken_language)
 
         # Step 3: Vector retrieval
-        assistant_vector_db_path = f"assistant_{assistant_id}"
-        retriever = initialize_vector_db_for_session(assistant_vector_db_path)
-        docs = retriever.invoke(user_query)
+        if speculation:
+            # Not inside a slot: finalize waits for the speculative retrieval, which takes one itself
+            with span("retrieval"):
+                docs, speculation_outcome = await speculation.finalize(user_query)
+        else:
+            async with slot("ollama", VOICE):
+                with span("vector_db_init"):
+                    retriever = await asyncio.to_thread(initialize_vector_db_for_session, assistant_vector_db_path)
+                with span("retrieval"):
+                    docs = await asyncio.to_thread(retriever.invoke, user_query)
         context = "\n\n".join([doc.page_content for doc in docs]) if docs else ""
 
-        # Step 4: Generate response with strong Hindi enforcement
-        hindi_system_prompt = f"""
-        {system_prompt}
-        
-        Important Instructions:
-        1. You must respond in Hindi language only.
-        2. Use simple Hindi words that are easy to understand.
-        3. If you don't know a Hindi word, explain the concept in simple Hindi.
-        4. Never respond in English.
-        
-        Context:
-        {context}
-        """
-        
-        prompt = create_assistant_prompt(
-            system_prompt=hindi_system_prompt,
-            first_message=first_message,
-            context=context
-        )
-        messages = prompt.format(user_input=user_query)
+        # Step 4: Generate response, with strong Hindi enforcement for Hindi speakers
+        with span("prompt_build"):
+            prompt = prompt_registry.get(assistant_id, system_prompt=system_prompt, first_message=first_message)
+            messages = prompt.build(user_query, context=context, language=response_language)
         
-        bot_response = generate_response(
-            messages,
-            model="llama3-8b-8192",
-            language=language
-        )
+        async with slot("groq", VOICE):
+            with span("llm"):
+                bot_response = await asyncio.to_thread(
+                    generate_response,
+                    messages,
+                    model="llama3-8b-8192",
+                    deadline_s=VOICE_LLM_DEADLINE_S
+                )
 
         # Step 5: Store in Supabase
-        supabase.table("chat_history").insert({
-            "session_id": session_id,
-            "user_query": user_query,
-            "bot_response": bot_response,
-            "assistant_id": assistant_id
-        }).execute()
+        async with slot("supabase", VOICE):
+            with span("history_insert"):
+                await asyncio.to_thread(supabase.table("chat_history").insert({
+                    "session_id": session_id,
+                    "user_query": user_query,
+                    "bot_response": bot_response,
+                    "assistant_id": assistant_id
+                }).execute)
 
         return {
             "response": bot_response,
             "transcription": user_query,
+            "language": response_language,
             "assistant_id": assistant_id,
-            "session_id": session_id
+            "session_id": session_id,
+            "audio_preprocessing": audio_stats,
+            "speculative_retrieval": speculation_outcome
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in voice chat: {str(e)}")
 
+@app.post("/batch")
+async def batch_chat(data: TestDataInput):
+    """Answer a list of questions for one assistant, streaming results as NDJSON as each completes.
+
+    Each result's "index" is the question's position in the request; blank questions get an error result.
+    """
+    if len(data.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{len(data.questions)} questions, limit is {MAX_BATCH_QUESTIONS} per batch"
+        )
+    # Enumerate before dropping blanks so indexes match the request
+    indexed = [(index, q) for index, q in enumerate(data.questions) if q and q.strip()]
+    blank = [index for index, q in enumerate(data.questions) if not (q and q.strip())]
+    if not indexed:
+        raise HTTPException(status_code=400, detail="Missing questions")
+    questions = [q for _, q in indexed]
+
+    try:
+        # One token per question: a batch counts against the assistant like the individual chats would.
+        # One larger than the burst is admitted when the bucket is full and paid back before the next request
+        assistant_limiter.check(data.assistant_id, cost=len(questions))
+
+        # Fetch assistant config
+        async with slot("supabase", BATCH):
+            with span("assistant_lookup"):
+                assistant = await asyncio.to_thread(
+                    supabase.table("assistants").select("*").eq("assistant_id", data.assistant_id).execute
+                )
+        if not assistant.data:
+            raise HTTPException(status_code=404, detail="Assistant not found")
+
+        assistant_config = assistant.data[0]
+
+        # Batched embedding + bulk vector retrieval for all questions
+        assistant_vector_db_path = f"assistant_{data.assistant_id}"
+        async with slot("ollama", BATCH):
+            with span("retrieval"):
+                docs_per_question = await asyncio.to_thread(batch_retrieve, assistant_vector_db_path, questions)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in batch: {str(e)}")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    prompt = prompt_registry.get(
+        data.assistant_id,
+        system_prompt=assistant_config.get("system_prompt", ""),
+        first_message=assistant_config.get("first_message", "")
+    )
+
+    async def answer(index: int, question: str, docs) -> Dict:
+        async with semaphore:
+            try:
+                context = "\n\n".join([doc.page_content for doc in docs]) if docs else ""
+                messages = prompt.build(question, context=context)
+                async with slot("groq", BATCH):
+                    with span("llm"):
+                        bot_response = await asyncio.to_thread(generate_response, messages)
+                return {"index": index, "question": question, "response": bot_response}
+            except Exception as e:
+                return {"index": index, "question": question, "error": str(e)}
+
+    async def stream_results():
+        for index in blank:
+            yield json.dumps({"index": index, "question": data.questions[index], "error": "Empty question"}) + "\n"
+        tasks = [
+            asyncio.create_task(answer(index, question, docs))
+            for (index, question), docs in zip(indexed, docs_per_question)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            # Client went away: don't keep calling the LLM
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.get("/sentiment/{assistant_id}/{session_id}")
 async def get_sentiment(assistant_id: str, session_id: str):
     """Get sentiment analysis for session"""
     try:
-        res = supabase.table("chat_history") \
-                  .select("user_query, bot_response") \
-                  .eq("assistant_id", assistant_id) \
-                  .eq("session_id", session_id) \
-                  .order("created_at") \
-                  .execute()
+        async with slot("supabase", TEXT):
+            with span("history_lookup"):
+                res = await asyncio.to_thread(
+                    supabase.table("chat_history")
+                    .select("user_query, bot_response")
+                    .eq("assistant_id", assistant_id)
+                    .eq("session_id", session_id)
+                    .order("created_at")
+                    .execute
+                )
         
         if not res.data:
             return {"sentiment": "No chat history available"}
@@ -471,7 +679,10 @@ async def get_sentiment(assistant_id: str, session_id: str):
             "bot": chat["bot_response"]
         } for chat in res.data]
 
-        _, sentiment = analyze_session_sentiment(session_id, session_data)
+        # Calls Groq: queued with the other Groq work, off the event loop
+        async with slot("groq", TEXT):
+            with span("sentiment"):
+                _, sentiment = await asyncio.to_thread(analyze_session_sentiment, session_id, session_data)
         
         return {
             "assistant_id": assistant_id,
@@ -480,9 +691,17 @@ async def get_sentiment(assistant_id: str, session_id: str):
             "message_count": len(session_data)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(500, f"Error in sentiment analysis: {str(e)}")
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    data, content_type = render_metrics()
+    return Response(content=data, media_type=content_type)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
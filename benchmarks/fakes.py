@@ -0,0 +1,251 @@
+# fakes.py
+# In-process stand-ins for Groq, Supabase, Ollama embeddings and Murf so the
+# API can be benchmarked offline without paid services.
+
+import io
+import os
+import time
+import wave
+import hashlib
+import itertools
+import threading
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+
+
+# ===================== Stage Timings =====================
+class StageRecorder:
+    """Collects wall-clock durations per named stage (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage):
+        recorder = self
+
+        class _Timer:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                recorder.record(stage, time.perf_counter() - self.start)
+
+        return _Timer()
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+
+recorder = StageRecorder()
+
+
+# ===================== Fake Groq =====================
+class _FakeCompletions:
+    def __init__(self, config):
+        self.config = config
+
+    def create(self, messages, model, temperature=0.7, **kwargs):
+        with recorder.timed("groq.chat"):
+            time.sleep(self.config.first_token_latency + self.config.token_latency * self.config.response_tokens)
+            last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+            content = f"[{model}] " + " ".join(itertools.islice(itertools.cycle(last_user.split() or ["ok"]), self.config.response_tokens))
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class _FakeTranscriptions:
+    def __init__(self, config):
+        self.config = config
+
+    def create(self, file, model, language=None, response_format=None, **kwargs):
+        with recorder.timed("groq.transcribe"):
+            time.sleep(self.config.transcription_latency)
+            return SimpleNamespace(text="What is LenDenClub and is it safe to invest?", language="English")
+
+
+class FakeGroqConfig:
+    first_token_latency = 0.05
+    token_latency = 0.002
+    response_tokens = 60
+    transcription_latency = 0.15
+
+
+class FakeGroq:
+    """Drop-in for groq.Groq with configurable per-token latency"""
+    config = FakeGroqConfig()
+
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self.config))
+        self.audio = SimpleNamespace(transcriptions=_FakeTranscriptions(self.config))
+
+
+# ===================== Fake Supabase =====================
+class _Query:
+    def __init__(self, store, table):
+        self.store = store
+        self.table = table
+        self.operation = "select"
+        self.filters = []
+        self.order_by = None
+        self.is_single = False
+        self.payload = None
+
+    def select(self, *columns):
+        self.operation = "select"
+        return self
+
+    def insert(self, payload):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    def execute(self):
+        with recorder.timed(f"supabase.{self.operation}"):
+            time.sleep(self.store.latency)
+            if self.operation == "insert":
+                return SimpleNamespace(data=self.store.insert(self.table, self.payload))
+
+            rows = self.store.select(self.table, self.filters)
+            if self.order_by:
+                column, desc = self.order_by
+                rows.sort(key=lambda row: str(row.get(column, "")), reverse=desc)
+            if self.is_single:
+                if len(rows) != 1:
+                    raise Exception(f"Expected a single row, got {len(rows)}")
+                return SimpleNamespace(data=rows[0])
+            return SimpleNamespace(data=rows)
+
+
+class _FakeBucket:
+    def __init__(self, store, bucket):
+        self.store = store
+        self.bucket = bucket
+
+    def upload(self, path, file, file_options=None):
+        with recorder.timed("supabase.storage.upload"):
+            time.sleep(self.store.latency)
+            data = file if isinstance(file, bytes) else file.read()
+            with self.store.lock:
+                self.store.objects[(self.bucket, path)] = data
+            return SimpleNamespace(path=path)
+
+    def get_public_url(self, path):
+        return f"memory://{self.bucket}/{path}"
+
+
+class FakeSupabase:
+    """In-memory table store exposing the subset of the supabase client the app uses"""
+
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.tables = defaultdict(list)
+        self.objects = {}
+        self._ids = itertools.count(1)
+        self.storage = SimpleNamespace(from_=lambda bucket: _FakeBucket(self, bucket))
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def insert(self, table, payload):
+        rows = payload if isinstance(payload, list) else [payload]
+        stored = []
+        with self.lock:
+            for row in rows:
+                row = {"id": next(self._ids), "created_at": datetime.utcnow().isoformat(), **row}
+                self.tables[table].append(row)
+                stored.append(row)
+        return stored
+
+    def select(self, table, filters):
+        with self.lock:
+            return [
+                dict(row) for row in self.tables[table]
+                if all(str(row.get(column)) == str(value) for column, value in filters)
+            ]
+
+
+# ===================== Fake Embeddings =====================
+class FakeEmbeddings:
+    """Deterministic hash-based embeddings, stand-in for OllamaEmbeddings"""
+    dimensions = 256
+    latency = 0.002
+
+    def __init__(self, model=None, **kwargs):
+        self.model = model
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for token in text.lower().split():
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        with recorder.timed("embed"):
+            time.sleep(self.latency)
+            return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# ===================== Silent TTS =====================
+def silent_wav(seconds=1.0, sample_rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+class FakeMurf:
+    """Drop-in for murf.Murf that streams silence"""
+
+    def __init__(self, api_key=None, **kwargs):
+        self.text_to_speech = SimpleNamespace(stream=self._stream)
+
+    def _stream(self, text, voice_id=None, **kwargs):
+        with recorder.timed("tts"):
+            yield silent_wav(seconds=min(5.0, 0.05 * len(text.split())))
+
+
+# ===================== Installation =====================
+def install_fakes(supabase_latency=0.005):
+    """Patch the client factories the app imports, before api_server is imported"""
+    import groq
+    import murf
+    import supabase
+    import langchain_ollama
+
+    # Clients that are not faked still validate that a key is configured
+    os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+    store = FakeSupabase(latency=supabase_latency)
+    supabase.create_client = lambda url, key, *args, **kwargs: store
+    groq.Groq = FakeGroq
+    murf.Murf = FakeMurf
+    langchain_ollama.OllamaEmbeddings = FakeEmbeddings
+    return store
@@ -0,0 +1,77 @@
+# import_budget.py
+# Fails (exit 1) if importing the app gets slow again or pulls heavy
+# dependencies in at import time instead of on first use.
+#
+#   python -m benchmarks.import_budget --budget-ms 1500
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported lazily, on first use
+DEFERRED_MODULES = [
+    "pandas",
+    "groq",
+    "supabase",
+    "chromadb",
+    "langchain_chroma",
+    "langchain_ollama",
+    "langchain_groq",
+    "langchain_community",
+    "murf",
+    "gtts",
+    "pyttsx3",
+    "pydub",
+    "simpleaudio",
+    "speech_recognition",
+]
+
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    """Import time of module in fresh interpreters, plus any deferred modules it dragged in"""
+    timings, loaded = [], set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(sample["seconds"])
+        loaded.update(sample["loaded"])
+    return statistics.median(timings), sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import-time budget of the app modules")
+    parser.add_argument("--modules", default="api_server,modules.asr_module,modules.sentiment_analysis,modules.vector,modules.supabase_client")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        seconds, loaded = measure(module, args.runs)
+        over_budget = seconds * 1000 > args.budget_ms
+        status = "FAIL" if over_budget or loaded else "ok"
+        failed = failed or status == "FAIL"
+        print(f"{status:<5}{module:<36}{seconds * 1000:>8.0f} ms" + (f"   eagerly imports: {', '.join(loaded)}" if loaded else ""))
+
+    print(f"\nbudget: {args.budget_ms:.0f} ms per module")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
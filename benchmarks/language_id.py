@@ -0,0 +1,64 @@
+# language_id.py
+# Accuracy and per-call latency of language detection over a labeled set.
+#
+#   python -m benchmarks.language_id
+
+import os
+import csv
+import time
+import argparse
+
+from modules.language_id import detect_language
+
+LABELED_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "language_id.csv")
+
+
+def naive_detect_language(text):
+    """The previous substring-based detector from asr_module, for comparison"""
+    is_hindi = any('ऀ' <= ch <= 'ॿ' for ch in text) or any(
+        word in text.lower() for word in ['mera','mujhe','naam','kaise', 'hai', 'kya', 'kaun', 'aap', 'madat', 'ji', 'bataiye']
+    )
+    return "hi" if is_hindi else "en"
+
+
+def uncached_detect_language(text):
+    return detect_language.__wrapped__(text)
+
+
+def evaluate(detector, rows, repeat):
+    errors = [(text, label) for text, label in rows if detector(text) != label]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, _ in rows:
+            detector(text)
+    per_call_us = (time.perf_counter() - start) / (repeat * len(rows)) * 1e6
+    return 1 - len(errors) / len(rows), per_call_us, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark language detection")
+    parser.add_argument("--labeled-set", default=LABELED_SET)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args(argv)
+
+    with open(args.labeled_set, newline="", encoding="utf-8") as f:
+        rows = [(row["text"], row["label"]) for row in csv.DictReader(f)]
+
+    detectors = {
+        "naive (previous)": naive_detect_language,
+        "language_id": uncached_detect_language,
+        "language_id (cached)": detect_language,
+    }
+    print(f"{len(rows)} labeled utterances\n")
+    print(f"{'detector':<24}{'accuracy':>10}{'us/call':>10}")
+    for name, detector in detectors.items():
+        accuracy, per_call_us, errors = evaluate(detector, rows, args.repeat)
+        print(f"{name:<24}{accuracy:>10.1%}{per_call_us:>10.2f}")
+        if args.show_errors:
+            for text, label in errors:
+                print(f"    expected {label}: {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# run_api_benchmark.py
+# Drives api_server.py against in-process fakes and reports throughput,
+# per-stage latency percentiles and memory.
+#
+#   python -m benchmarks.run_api_benchmark --concurrency 16 --requests 200
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+
+import httpx
+
+from benchmarks.fakes import FakeGroq, FakeEmbeddings, install_fakes, recorder, silent_wav
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DOC = (
+    "Question,Answer\n"
+    "What is LenDenClub?,LenDenClub is India's largest P2P lending platform\n"
+    "Is it RBI registered?,Yes - Innofin Solutions Pvt Ltd is an RBI registered NBFC-P2P\n"
+    "What is the minimum amount?,Fund diversification starts from Rs 100\n"
+    "What returns can I expect?,Expected returns are around 11.33% p.a.\n"
+).encode("utf-8")
+QUESTIONS = [
+    "What is LenDenClub?",
+    "How does P2P lending work on LenDenClub?",
+    "Is LenDenClub registered with RBI?",
+    "What returns can I expect?",
+]
+
+
+# ===================== Stats =====================
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+# ===================== Scenarios =====================
+def create_assistant_request(name="bench"):
+    return {
+        "data": {
+            "user_id": "bench_user",
+            "name": name,
+            "first_message": "Hello! How can I help you today?",
+            "system_prompt": "You are a helpful LenDenClub relationship manager.",
+        },
+        "files": [("files", ("faq.csv", SAMPLE_DOC, "text/csv"))],
+    }
+
+
+def build_scenarios(assistant_id):
+    audio = silent_wav(seconds=2.0)
+    return {
+        "chat": lambda i: ("POST", f"/chat/{assistant_id}/bench_{i % 8}", {"json": {"user_query": QUESTIONS[i % len(QUESTIONS)]}}),
+        "voice": lambda i: ("POST", f"/voice-chat/{assistant_id}/bench_{i % 8}", {
+            "files": [("audio_file", ("turn.wav", audio, "audio/wav"))],
+            "data": {"language": "en"},
+        }),
+        "create": lambda i: ("POST", "/assistants/create", create_assistant_request(name=f"bench_{i}")),
+    }
+
+
+async def run_scenario(client, build_request, total, concurrency):
+    latencies, statuses = [], {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            method, url, kwargs = build_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+async def run(args):
+    import api_server
+
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        created = await client.post("/assistants/create", **create_assistant_request())
+        created.raise_for_status()
+        scenarios = build_scenarios(created.json()["assistant_id"])
+
+        report = {}
+        for name in args.endpoints:
+            recorder.reset()
+            tracemalloc.reset_peak()
+            elapsed, latencies, statuses = await run_scenario(client, scenarios[name], args.requests, args.concurrency)
+            report[name] = {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "throughput_rps": args.requests / elapsed if elapsed else 0.0,
+                "statuses": statuses,
+                "end_to_end": summarize(latencies),
+                "stages": {stage: summarize(samples) for stage, samples in sorted(recorder.samples.items())},
+                "peak_traced_mb": tracemalloc.get_traced_memory()[1] / 2**20,
+            }
+    return report
+
+
+def print_report(report):
+    for name, result in report.items():
+        print(f"\n=== {name} ({result['requests']} requests, concurrency {result['concurrency']}) ===")
+        print(f"throughput: {result['throughput_rps']:.1f} req/s   statuses: {result['statuses']}   peak traced: {result['peak_traced_mb']:.1f} MB")
+        print(f"{'stage':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        rows = [("end_to_end", result["end_to_end"])] + list(result["stages"].items())
+        for stage, stats in rows:
+            print(f"{stage:<28}{stats['count']:>8}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    print(f"\nmax RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+# ===================== Entry =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the VoiceBot API")
+    parser.add_argument("--endpoints", default="chat,voice,create", help="Comma-separated: chat, voice, create")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-latency", type=float, default=FakeGroq.config.first_token_latency)
+    parser.add_argument("--token-latency", type=float, default=FakeGroq.config.token_latency)
+    parser.add_argument("--response-tokens", type=int, default=FakeGroq.config.response_tokens)
+    parser.add_argument("--transcription-latency", type=float, default=FakeGroq.config.transcription_latency)
+    parser.add_argument("--embed-latency", type=float, default=FakeEmbeddings.latency)
+    parser.add_argument("--supabase-latency", type=float, default=0.005)
+    parser.add_argument("--assistant-rate-limit", type=float, default=0.0,
+                        help="Per-assistant requests/s (0 = off, so the run measures throughput, not the limiter)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+
+    FakeGroq.config.first_token_latency = args.first_token_latency
+    FakeGroq.config.token_latency = args.token_latency
+    FakeGroq.config.response_tokens = args.response_tokens
+    FakeGroq.config.transcription_latency = args.transcription_latency
+    FakeEmbeddings.latency = args.embed_latency
+    install_fakes(supabase_latency=args.supabase_latency)
+    # Read when modules.admission is imported
+    os.environ["ASSISTANT_RATE_LIMIT"] = str(args.assistant_rate_limit)
+
+    # The app resolves Context/ relative to the working directory
+    json_path = os.path.abspath(args.json) if args.json else None
+    sys.path.insert(0, REPO_ROOT)
+    with tempfile.TemporaryDirectory(prefix="voicebot_bench_") as workdir:
+        os.chdir(workdir)
+        tracemalloc.start()
+        report = asyncio.run(run(args))
+        tracemalloc.stop()
+
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
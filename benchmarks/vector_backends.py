@@ -0,0 +1,138 @@
+# vector_backends.py
+# Recall, latency and memory of the Chroma (HNSW) path against the compact
+# int8 index on synthetic clustered embeddings of the production dimension.
+#
+#   python -m benchmarks.vector_backends --vectors 20000 --queries 200
+
+import os
+import gc
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import numpy as np
+
+from modules.compact_index import CompactIndex
+
+# llama3.2 embeddings from OllamaEmbeddings
+DIMENSION = 3072
+
+
+def make_data(n, dim, n_queries, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    # Queries are noisy copies of stored vectors, like a question close to one chunk
+    queries = vectors[rng.integers(n, size=n_queries)] + 0.3 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    return vectors, queries
+
+
+def exact_neighbours(vectors, queries, k):
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    return [np.argsort(norms - 2 * (vectors @ q))[:k].tolist() for q in queries]
+
+
+def recall(truth, found):
+    return float(np.mean([len(set(t) & set(f)) / len(t) for t, f in zip(truth, found)]))
+
+
+def percentiles(samples):
+    return np.percentile(np.asarray(samples) * 1000, 50), np.percentile(np.asarray(samples) * 1000, 95)
+
+
+def rss_mb():
+    # Current (not peak) resident set size; Linux only
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+# ===================== Backends =====================
+def bench_chroma(workdir, vectors, queries, k):
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"), settings=Settings(anonymized_telemetry=False))
+    collection = client.get_or_create_collection("bench")
+    ids = [str(i) for i in range(len(vectors))]
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), 1000):
+        collection.add(ids=ids[offset:offset + 1000], embeddings=vectors[offset:offset + 1000],
+                       documents=ids[offset:offset + 1000])
+    build_s = time.perf_counter() - start
+
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append(time.perf_counter() - start)
+        found.append([int(i) for i in result["ids"][0]])
+    return {
+        "build_s": build_s,
+        "latencies": latencies,
+        "found": found,
+        "rss_growth_mb": rss_mb() - rss_before,
+    }
+
+
+def bench_compact(workdir, vectors, queries, k):
+    directory = os.path.join(workdir, "compact")
+    ids = [str(i) for i in range(len(vectors))]
+    start = time.perf_counter()
+    CompactIndex.build(directory, ids, vectors, ids, [{}] * len(ids))
+    build_s = time.perf_counter() - start
+
+    index = CompactIndex(directory)
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found.append(index.search_many([query], k=k)[0])
+        latencies.append(time.perf_counter() - start)
+    return {
+        "build_s": build_s,
+        "latencies": latencies,
+        "found": found,
+        "resident_mb": index.resident_bytes / 1024 / 1024,
+    }
+
+
+# ===================== Entry =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Chroma against the compact int8 index")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=DIMENSION)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args(argv)
+
+    vectors, queries = make_data(args.vectors, args.dimension, args.queries, args.clusters, args.seed)
+    truth = exact_neighbours(vectors, queries, args.k)
+    float32_mb = vectors.nbytes / 1024 / 1024
+
+    workdir = tempfile.mkdtemp(prefix="vector_bench_")
+    try:
+        results = {"compact": bench_compact(workdir, vectors, queries, args.k)}
+        gc.collect()
+        if not args.skip_chroma:
+            results["chroma"] = bench_chroma(workdir, vectors, queries, args.k)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n📊 {args.vectors} vectors x {args.dimension} dims, {args.queries} queries, recall@{args.k} vs exact search")
+    print(f"float32 vectors: {float32_mb:.1f} MB")
+    print(f"{'backend':<10}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'build s':>10}  memory")
+    for name, result in results.items():
+        p50, p95 = percentiles(result["latencies"])
+        if name == "compact":
+            memory = f"{result['resident_mb']:.1f} MB resident (float32 re-rank rows memory-mapped)"
+        else:
+            memory = f"+{result['rss_growth_mb']:.1f} MB RSS after build + queries"
+        print(f"{name:<10}{recall(truth, result['found']):>8.3f}{p50:>10.2f}{p95:>10.2f}{result['build_s']:>10.2f}  {memory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,68 +3,16 @@ import streamlit as st
 from modules.vector import initialize_vector_db_for_session
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import ChatPromptTemplate
+from modules.prompts import LENDENCLUB_TEMPLATE
 from modules.supabase_client import save_conversation, get_conversation_history
 from modules.asr_module import listen_to_user, speak_text
+from modules.sessions import get_next_session_id, list_sessions
 
 model = OllamaLLM(model="llama3.2")
 
 st.session_state.setdefault("session_id", "session_1")
 
-prompt_template = """
-You are a "Relationship Manager" named Satyajit working at Lenden Club, you are trained to support users with Lenden Club related queries , AND NOTHING ELSE. Lenden Club is a peer-to-peer (P2P) lending platforms. Your job is to help with the following three tasks for LenDenClub Customers, India's largest P2P lending platform.
-
-When responding to queries about P2P lending or LenDenClub, always follow these guidelines:
-
-1) Help with Initial Onboarding:
-- Explain platform features simply
-- Mention fund diversification starts from ₹100
-- State max lending amount is ₹10 Lakhs
-- Highlight escrow safety with ICICI Trusteeship
-- Share expected returns (~11.33% p.a.)
-- Explain borrower verification (600+ data points)
-- Mention 95.6% on-time repayment rate
-
-2) Explain Key Terms (simple definitions):
-- P2P Lending: Direct lending between individuals via platform
-- AUM (₹1,023 Cr): Total money managed by platform
-- NPA (3.78%): Loans not repaid on time
-- Escrow: Protected account managed by ICICI Trusteeship
-- Diversification: Spreading ₹100+ across multiple loans
-- EMI: Monthly installment payments
-- Interest vs Returns: What borrowers pay vs lenders earn
-- InstaMoney: LenDenClub's app (3Cr+ downloads)
-
-3) Risk Management:
-- Clearly state: "P2P lending carries risks"
-- Mention RBI regulates the platform (NBFC-P2P)
-- Explain 3.78% NPA means some loans may default
-- Stress importance of diversification
-- Highlight escrow protection
-- Note 95.6% repayment rate
-- Mention zero principal loss since launch
-
-Always use the latest platform data (Dec 2024):
-- 2Cr+ users, ₹16,011Cr total lent
-- 85% personal, 15% merchant loans
-- RBI registered (Innofin Solutions Pvt Ltd)
-
-Relevant Documents:
-{context}
-
-User Query:
-{question}
-"""
-prompt = ChatPromptTemplate.from_template(prompt_template)
-
-def get_next_session_id(context_root="Context"):
-    os.makedirs(context_root, exist_ok=True)
-    existing = [d for d in os.listdir(context_root) if d.startswith("session_")]
-    nums = [int(d.split("_")[1]) for d in existing if d.split("_")[1].isdigit()]
-    next_id = max(nums, default=0) + 1
-    return f"session_{next_id}"
-
-def list_sessions(context_root="Context"):
-    return sorted([d for d in os.listdir(context_root) if d.startswith("session_")])
+prompt = ChatPromptTemplate.from_template(LENDENCLUB_TEMPLATE)
 
 def save_uploaded_files(files, session_id):
     upload_path = f"Context/{session_id}/docs"
@@ -0,0 +1,226 @@
+# admission.py
+# Admission control for the API: a bounded, prioritised queue in front of
+# each upstream dependency (Groq, Ollama, Supabase) and a token bucket per
+# assistant. When a queue is full, or a request would wait longer than
+# ADMISSION_MAX_WAIT_S, it is rejected straight away with 503 + Retry-After
+# instead of piling more load onto a dependency that is already behind.
+#
+# Limits are per worker process.
+
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from prometheus_client import Counter, Gauge, Histogram
+
+# Lower value = served first when a dependency is saturated
+VOICE = 0
+TEXT = 1
+BATCH = 2
+PRIORITY_NAMES = {VOICE: "voice", TEXT: "text", BATCH: "batch"}
+
+# Longest a request may queue for one dependency before it is turned away
+MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", "10"))
+
+# Requests per second (and burst) allowed per assistant; 0 disables the limit
+ASSISTANT_RATE_LIMIT = float(os.getenv("ASSISTANT_RATE_LIMIT", "5"))
+ASSISTANT_BURST = int(os.getenv("ASSISTANT_BURST", "20"))
+
+QUEUE_DEPTH = Gauge(
+    "voicebot_admission_queue_depth",
+    "Requests waiting for a dependency slot",
+    ["dependency"],
+    multiprocess_mode="livesum",
+)
+IN_FLIGHT = Gauge(
+    "voicebot_admission_in_flight",
+    "Requests holding a dependency slot",
+    ["dependency"],
+    multiprocess_mode="livesum",
+)
+QUEUE_WAIT = Histogram(
+    "voicebot_admission_wait_seconds",
+    "Time spent queued for a dependency slot",
+    ["dependency", "priority"],
+    buckets=(0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+REJECTED = Counter(
+    "voicebot_admission_rejected_total",
+    "Requests turned away by admission control",
+    ["dependency", "reason"],
+)
+
+
+class Overloaded(HTTPException):
+    """Raised when a request cannot be admitted; handled by FastAPI like any HTTPException"""
+
+    def __init__(self, status_code, detail, retry_after):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+
+# ===================== Dependency Queues =====================
+class DependencyGate:
+    """At most `concurrency` holders at a time, at most `max_queue` waiters, served by priority then arrival.
+
+    Runs on the event loop; the work done while holding a slot may run in a thread.
+    """
+
+    def __init__(self, name, concurrency, max_queue, max_wait=MAX_WAIT_S):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        # Smoothed slot hold time, used to estimate Retry-After
+        self._hold_s = 0.5
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def retry_after(self):
+        return self._hold_s * (self.queued + 1) / self.concurrency
+
+    def _reject(self, reason):
+        REJECTED.labels(self.name, reason).inc()
+        raise Overloaded(503, f"{self.name} is saturated, retry later", self.retry_after())
+
+    async def _acquire(self, priority):
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+        # Nobody would get through in time: reject now rather than after max_wait
+        if self.retry_after() > self.max_wait:
+            self._reject("wait_too_long")
+
+        entry = (priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        QUEUE_DEPTH.labels(self.name).inc()
+        try:
+            done, _ = await asyncio.wait([entry[2]], timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if not done:
+            self._abandon(entry)
+            self._reject("timeout")
+        # The releasing holder handed its slot over; _active already counts us
+
+    def _abandon(self, entry):
+        future = entry[2]
+        if future.done() and not future.cancelled():
+            # Slot was handed over just as we gave up: pass it on
+            self._release()
+            return
+        future.cancel()
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            QUEUE_DEPTH.labels(self.name).dec()
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            QUEUE_DEPTH.labels(self.name).dec()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority=TEXT):
+        queued_at = time.perf_counter()
+        await self._acquire(priority)
+        acquired_at = time.perf_counter()
+        QUEUE_WAIT.labels(self.name, PRIORITY_NAMES.get(priority, str(priority))).observe(acquired_at - queued_at)
+        IN_FLIGHT.labels(self.name).inc()
+        try:
+            yield
+        finally:
+            IN_FLIGHT.labels(self.name).dec()
+            self._hold_s = 0.8 * self._hold_s + 0.2 * (time.perf_counter() - acquired_at)
+            self._release()
+
+
+def _gate(name, concurrency, max_queue):
+    prefix = f"ADMISSION_{name.upper()}"
+    return DependencyGate(
+        name,
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", max_queue)),
+    )
+
+
+GATES = {
+    "groq": _gate("groq", 8, 64),
+    "ollama": _gate("ollama", 4, 64),
+    "supabase": _gate("supabase", 16, 128),
+}
+
+
+def slot(dependency, priority=TEXT):
+    """async with slot("groq", VOICE): ..."""
+    return GATES[dependency].slot(priority)
+
+
+# ===================== Per-assistant Rate Limits =====================
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, cost=1.0):
+        """0 if admitted, otherwise seconds until `cost` tokens are available.
+
+        A cost above the burst is admitted from a full bucket and leaves it in debt,
+        so it is still paid in full at the sustained rate.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+
+class AssistantRateLimiter:
+    def __init__(self, rate=ASSISTANT_RATE_LIMIT, burst=ASSISTANT_BURST, max_assistants=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_assistants = max_assistants
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, assistant_id, cost=1.0):
+        """Raises Overloaded (429) if the assistant is over its rate"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(assistant_id)
+            if bucket is None:
+                bucket = self._buckets[assistant_id] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_assistants:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(assistant_id)
+            wait = bucket.take(cost)
+        if wait:
+            REJECTED.labels("assistant", "rate_limited").inc()
+            raise Overloaded(429, "Rate limit exceeded for this assistant", wait)
+
+
+assistant_limiter = AssistantRateLimiter()
@@ -1,34 +1,31 @@
 # asr_module.py
 
 import io
-from pydub import AudioSegment
-import simpleaudio as sa
-import speech_recognition as sr
-from murf import Murf
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
+import collections
+from modules.lazy import LazyClient
+from modules.vad import VoiceActivityDetector
+from modules.language_id import detect_language
 from modules.vector import initialize_vector_db_for_session
 from modules.supabase_client import save_conversation
 
 MURF_API_KEY = "ap2_1aa2088b-4bf0-4292-9262-fb4f4284a3ff"  # Replace with your actual API key
 
-def detect_language(text):
-    # Naive Hindi detector
-    return any('\u0900' <= ch <= '\u097F' for ch in text) or any(
-        word in text.lower() for word in ['mera','mujhe','naam','kaise', 'hai', 'kya', 'kaun', 'aap', 'madat', 'ji', 'bataiye']
-    )
+def _create_murf():
+    from murf import Murf
+    return Murf(api_key=MURF_API_KEY)
 
-from gtts import gTTS
-import pyttsx3
-
-engine = pyttsx3.init()
+murf_client = LazyClient(_create_murf)
 
 def speak_text(text, lang="en"):
+    from pydub import AudioSegment
+    import simpleaudio as sa
+
     print("🤖 Bot:", text)
     print("🤖 Language Detected:", lang)
 
     if lang == "hi":
         # Generate Hindi audio with gTTS
+        from gtts import gTTS
         tts = gTTS(text=text, lang='hi')
         tts.save("response_hi.mp3")
 
@@ -41,8 +38,7 @@ def speak_text(text, lang="en"):
         play_obj = wave_obj.play()
         play_obj.wait_done()
     else:
-        # Use Murf or pyttsx3 for English
-        murf_client = Murf(api_key=MURF_API_KEY)
+        # Use Murf for English
         audio_stream = murf_client.text_to_speech.stream(text=text, voice_id="en-IN-rohan")
         audio_data = b''.join(audio_stream)
         audio_segment = AudioSegment.from_file(io.BytesIO(audio_data), format="wav")
@@ -56,69 +52,94 @@ def speak_text(text, lang="en"):
         play_obj.wait_done()
 
 
+class VoiceCapture:
+    """Keeps the microphone open across turns and ends each utterance with the VAD.
+
+    Noise is calibrated once when the capture opens; after that the VAD's noise
+    floor follows the room between utterances.
+    """
+
+    SAMPLE_RATE = 16000
+    PRE_ROLL_MS = 300  # audio kept from just before speech was detected
+    MAX_UTTERANCE_S = 30
+
+    def __init__(self, calibration_s=1.0):
+        import speech_recognition as sr
+
+        self.recognizer = sr.Recognizer()
+        self.vad = VoiceActivityDetector(sample_rate=self.SAMPLE_RATE)
+        self.microphone = sr.Microphone(sample_rate=self.SAMPLE_RATE, chunk_size=self.vad.frame_bytes // 2)
+        self.source = self.microphone.__enter__()
+
+        calibration_frames = int(calibration_s * 1000 / self.vad.frame_ms)
+        self.vad.calibrate(b"".join(self._read_frame() for _ in range(calibration_frames)))
+
+    def _read_frame(self):
+        return self.source.stream.read(self.source.CHUNK)
+
+    def _drain(self):
+        """Drop audio buffered since the last read (e.g. the bot's own reply played meanwhile)"""
+        available = self.source.stream.pyaudio_stream.get_read_available()
+        if available:
+            self.source.stream.read(available)
+
+    def capture_utterance(self):
+        import speech_recognition as sr
+
+        pre_roll = collections.deque(maxlen=self.PRE_ROLL_MS // self.vad.frame_ms)
+        frames = []
+        max_frames = self.MAX_UTTERANCE_S * 1000 // self.vad.frame_ms
+        self.vad.reset()
+        # The stream stays open between turns: start from live audio, not what queued up since
+        self._drain()
+
+        while True:
+            frame = self._read_frame()
+            event = self.vad.feed(frame)
+            if not self.vad.in_speech and event is None:
+                pre_roll.append(frame)
+                continue
+            if event == "start":
+                frames.extend(pre_roll)
+            frames.append(frame)
+            if event == "end" or len(frames) >= max_frames:
+                break
+
+        return sr.AudioData(b"".join(frames), self.SAMPLE_RATE, self.source.SAMPLE_WIDTH)
+
+    def close(self):
+        self.microphone.__exit__(None, None, None)
+
+
+_voice_capture = None
+
+def get_voice_capture():
+    global _voice_capture
+    if _voice_capture is None:
+        _voice_capture = VoiceCapture()
+    return _voice_capture
+
 def listen_to_user():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("\n🎤 Speak now...")
-        audio = recognizer.listen(source)
-        try:
-            text = recognizer.recognize_google(audio)
-            print("🗣️ You said:", text)
-            return text
-        except Exception as e:
-            print("❌ Error recognizing speech:", e)
-            return None
+    capture = get_voice_capture()
+    print("\n🎤 Speak now...")
+    audio = capture.capture_utterance()
+    try:
+        text = capture.recognizer.recognize_google(audio)
+        print("🗣️ You said:", text)
+        return text
+    except Exception as e:
+        print("❌ Error recognizing speech:", e)
+        return None
 
 def run_voice_qa(session_id):
+    from langchain_ollama import OllamaLLM
+    from langchain_core.prompts import ChatPromptTemplate
+    from modules.prompts import LENDENCLUB_TEMPLATE
+
     retriever = initialize_vector_db_for_session(session_id)
     model = OllamaLLM(model="llama3.2")
 
-    prompt_template = """
-    You are a "Relationship Manager" named Satyajit working at Lenden Club, you are trained to support users with Lenden Club related queries , AND NOTHING ELSE. Lenden Club is a peer-to-peer (P2P) lending platforms. Your job is to help with the following three tasks for LenDenClub Customers, India's largest P2P lending platform.
-
-    When responding to queries about P2P lending or LenDenClub, always follow these guidelines:
-
-    1) Help with Initial Onboarding:
-    - Explain platform features simply
-    - Mention fund diversification starts from ₹100
-    - State max lending amount is ₹10 Lakhs
-    - Highlight escrow safety with ICICI Trusteeship
-    - Share expected returns (~11.33% p.a.)
-    - Explain borrower verification (600+ data points)
-    - Mention 95.6% on-time repayment rate
-
-    2) Explain Key Terms (simple definitions):
-    - P2P Lending: Direct lending between individuals via platform
-    - AUM (₹1,023 Cr): Total money managed by platform
-    - NPA (3.78%): Loans not repaid on time
-    - Escrow: Protected account managed by ICICI Trusteeship
-    - Diversification: Spreading ₹100+ across multiple loans
-    - EMI: Monthly installment payments
-    - Interest vs Returns: What borrowers pay vs lenders earn
-    - InstaMoney: LenDenClub's app (3Cr+ downloads)
-
-    3) Risk Management:
-    - Clearly state: "P2P lending carries risks"
-    - Mention RBI regulates the platform (NBFC-P2P)
-    - Explain 3.78% NPA means some loans may default
-    - Stress importance of diversification
-    - Highlight escrow protection
-    - Note 95.6% repayment rate
-    - Mention zero principal loss since launch
-
-    Always use the latest platform data (Dec 2024):
-    - 2Cr+ users, ₹16,011Cr total lent
-    - 85% personal, 15% merchant loans
-    - RBI registered (Innofin Solutions Pvt Ltd)
-
-    Relevant Documents:
-    {context}
-
-    User Query:
-    {question}
-    """
-
-    prompt = ChatPromptTemplate.from_template(prompt_template)
+    prompt = ChatPromptTemplate.from_template(LENDENCLUB_TEMPLATE)
     chain = prompt | model
 
     chat_history = []
@@ -137,7 +158,7 @@ def run_voice_qa(session_id):
             break
 
         # Detect user language
-        lang = "hi" if detect_language(user_query) else "en"
+        lang = detect_language(user_query)
 
         # Query vector DB and LLM
         docs = retriever.invoke(user_query)
@@ -0,0 +1,170 @@
+# audio.py
+import io
+import os
+import time
+import shutil
+from modules.vad import VoiceActivityDetector
+
+# Groq's Whisper endpoint rejects files above 25 MB
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))
+# Multipart framing and the other form fields sent along with the audio file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Whisper works at 16 kHz mono internally; anything more is wasted upload
+TARGET_SAMPLE_RATE = 16000
+# Silence kept around the speech so word edges are not clipped
+KEEP_SILENCE_MS = 200
+# Shortest pause that splits an utterance for speculative retrieval
+PREFIX_PAUSE_MS = 300
+
+
+class AudioUploadError(ValueError):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ===================== Upload Handling =====================
+def get_upload_buffer(upload, max_bytes=MAX_AUDIO_BYTES):
+    """Return the uploaded audio as a file object, without copying it.
+
+    The multipart parser has already streamed the upload in chunks into a
+    spooled file (in memory, rolled over to a temp file above 1 MB) that is
+    closed once the request finishes, so nothing is written to the working
+    directory and nothing can leak. Bodies far over the limit never get this
+    far (see UploadLimitMiddleware); this checks the file itself.
+    """
+    buffer = upload.file
+    size = upload.size
+    if size is None:
+        size = buffer.seek(0, os.SEEK_END)
+
+    if size == 0:
+        raise AudioUploadError("Empty audio file")
+    if size > max_bytes:
+        raise AudioUploadError(f"Audio file is {size} bytes, limit is {max_bytes}", status_code=413)
+
+    buffer.seek(0)
+    return buffer
+
+
+class UploadLimitMiddleware:
+    """Rejects audio uploads over MAX_AUDIO_BYTES with 413 as they arrive, instead of after spooling them.
+
+    A declared Content-Length over the limit is refused before any of the body
+    is read; otherwise the body is counted while the form parser reads it, and
+    the request is aborted as soon as it passes the limit.
+    """
+
+    def __init__(self, app, path_prefixes=("/voice-chat/",), max_bytes=MAX_AUDIO_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            return await self.app(scope, receive, send)
+
+        detail = f"Audio upload is over the {MAX_AUDIO_BYTES} byte limit"
+        declared = dict(scope.get("headers") or []).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > self.max_bytes:
+            from starlette.responses import JSONResponse
+            response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parser: FastAPI turns it into the 413 response
+                    from fastapi import HTTPException
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# ===================== Normalization =====================
+def decode_audio(buffer, filename=None):
+    """Decode an upload to mono 16-bit PCM at up to 16 kHz (lower rates are kept: upsampling only adds bytes)"""
+    from pydub import AudioSegment
+
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower() or None
+    buffer.seek(0)
+    segment = AudioSegment.from_file(buffer, format=extension)
+    buffer.seek(0)
+    sample_rate = min(segment.frame_rate, TARGET_SAMPLE_RATE)
+    return segment.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+
+
+def normalize_audio(buffer, filename=None, segment=None):
+    """Downmix to mono, downsample to 16 kHz, trim leading/trailing silence and re-encode compactly.
+
+    Returns (buffer, filename, stats) ready to send for transcription. FLAC
+    needs ffmpeg; without it the output is 16-bit PCM WAV, which ffmpeg-free
+    pydub can also decode on the way in. Audio below 16 kHz keeps its rate,
+    and when nothing was trimmed and re-encoding would not make the upload
+    smaller (e.g. 8 kHz mp3), the original bytes are sent (stats["kept_original"]).
+
+    Pass the decode_audio() segment of the buffer if the caller already has it.
+    """
+    start = time.perf_counter()
+    if segment is None:
+        segment = decode_audio(buffer, filename)
+    bytes_in = buffer.seek(0, os.SEEK_END)
+    buffer.seek(0)
+    seconds_in = len(segment) / 1000
+    sample_rate = segment.frame_rate
+
+    # Trim silence at both ends with the VAD (clips without speech are left alone)
+    bounds = VoiceActivityDetector(sample_rate=sample_rate).speech_bounds(segment.raw_data)
+    trimmed = False
+    if bounds:
+        speech_start, speech_end = bounds
+        kept = segment[max(0, speech_start - KEEP_SILENCE_MS):speech_end + KEEP_SILENCE_MS]
+        trimmed = len(kept) < len(segment)
+        segment = kept
+
+    output_format = "flac" if shutil.which("ffmpeg") else "wav"
+    encoded = io.BytesIO()
+    segment.export(encoded, format=output_format)
+    encoded.seek(0)
+
+    # Already compact (e.g. a low-bitrate mp3) and nothing to trim: the re-encode only costs upload time
+    bytes_out = encoded.getbuffer().nbytes
+    kept_original = not trimmed and bytes_out >= bytes_in
+    if kept_original:
+        buffer.seek(0)
+        encoded, bytes_out = buffer, bytes_in
+        out_filename = filename
+    else:
+        stem = os.path.splitext(os.path.basename(filename or "audio"))[0]
+        out_filename = f"{stem}.{output_format}"
+
+    stats = {
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "seconds_in": round(seconds_in, 3),
+        "seconds_out": round(len(segment) / 1000, 3),
+        "sample_rate": sample_rate,
+        "kept_original": kept_original,
+        "preprocess_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    return encoded, out_filename, stats
+
+
+# ===================== Utterance Prefix =====================
+def extract_speech_prefix(segment, min_gap_ms=PREFIX_PAUSE_MS):
+    """Speech up to the last pause of a decode_audio() segment, as (wav_buffer, filename), or None if it has no pause"""
+    speech = VoiceActivityDetector(sample_rate=segment.frame_rate).speech_segments(segment.raw_data, min_gap_ms)
+    if len(speech) < 2:
+        return None
+
+    prefix = io.BytesIO()
+    segment[max(0, speech[0][0] - KEEP_SILENCE_MS):speech[-1][0]].export(prefix, format="wav")
+    prefix.seek(0)
+    return prefix, "prefix.wav"
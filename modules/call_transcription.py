@@ -0,0 +1,347 @@
+# call_transcription.py
+# Bulk transcription of recorded customer calls into a Parquet file.
+#
+#   python -m modules.call_transcription --backend stub --workers 8
+#   python -m modules.call_transcription --backend groq --language hi
+#
+# Each recording is decoded, normalized to 16 kHz mono, cut into chunks at
+# pauses (see modules/vad.py) and transcribed in a process pool. Results are
+# appended to Parquet part files as they complete and merged into the output
+# at the end, so a crash loses at most one part's worth of work. Files already
+# transcribed (same SHA-256, in the output or its parts) are skipped, so the
+# command can be re-run as new recordings arrive or after an interrupted run;
+# files that failed are tried again unless --skip-failed is given. A worker
+# crash fails only the recording that caused it.
+
+import io
+import os
+import glob
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from modules.vad import VoiceActivityDetector
+
+DEFAULT_INPUT_DIR = "data/Reviewed Call Recordings(60)"
+DEFAULT_OUTPUT = "data/call_transcripts.parquet"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".m4a", ".ogg")
+SAMPLE_RATE = 16000
+# Pause long enough to cut a chunk at, and silence kept around speech so words are not clipped
+PAUSE_MS = 500
+KEEP_SILENCE_MS = 200
+# Rows per Parquet part file written while the run is in progress
+FLUSH_ROWS = 10
+
+
+# ===================== ASR Backends =====================
+class StubBackend:
+    """Local stand-in: no network, returns a placeholder per chunk"""
+
+    def transcribe(self, wav_bytes, seconds, language=None):
+        return f"[{seconds:.1f}s of audio]"
+
+
+class GroqWhisperBackend:
+    model = "whisper-large-v3-turbo"
+
+    def __init__(self):
+        from groq import Groq
+        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+    def transcribe(self, wav_bytes, seconds, language=None):
+        kwargs = {"language": language} if language else {}
+        transcription = self.client.audio.transcriptions.create(
+            file=("chunk.wav", wav_bytes),
+            model=self.model,
+            **kwargs,
+        )
+        return transcription.text.strip()
+
+
+BACKENDS = {
+    "stub": StubBackend,
+    "groq": GroqWhisperBackend,
+}
+
+# One backend instance per worker process
+_backend = None
+
+def _get_backend(name):
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS[name]()
+    return _backend
+
+
+# ===================== Per-file Work =====================
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_at_pauses(audio, max_chunk_ms, min_gap_ms=PAUSE_MS):
+    """[(start_ms, end_ms)] chunks of at most max_chunk_ms covering the speech, cut at pauses.
+
+    Silence between chunks is left out; speech running longer than max_chunk_ms without a
+    pause is cut at max_chunk_ms. If the VAD finds no speech at all (e.g. a recording with
+    hardly any quiet frames to take the noise floor from), the whole recording is chunked.
+    """
+    segments = VoiceActivityDetector(sample_rate=audio.frame_rate).speech_segments(audio.raw_data, min_gap_ms)
+    if not segments:
+        segments = [(0, len(audio))]
+    chunks = []
+    for start, end in segments:
+        start = max(start - KEEP_SILENCE_MS, chunks[-1][1] if chunks else 0)
+        end = min(end + KEEP_SILENCE_MS, len(audio))
+        if chunks and end - chunks[-1][0] <= max_chunk_ms:
+            chunks[-1][1] = end
+            continue
+        while end - start > max_chunk_ms:
+            chunks.append([start, start + max_chunk_ms])
+            start += max_chunk_ms
+        chunks.append([start, end])
+    return [(start, end) for start, end in chunks]
+
+
+def empty_row(path, sha256, backend_name, error=None):
+    return {
+        "file": os.path.basename(path),
+        "sha256": sha256,
+        "backend": backend_name,
+        "processed_at": datetime.utcnow().isoformat(),
+        "duration_s": 0.0,
+        "chunks": 0,
+        "transcript": "",
+        "decode_s": 0.0,
+        "transcribe_s": 0.0,
+        "error": error,
+    }
+
+
+def transcribe_recording(path, sha256, backend_name, chunk_seconds, language=None):
+    """Decode, normalize, chunk at pauses and transcribe one recording; runs in a worker process"""
+    from pydub import AudioSegment
+
+    row = empty_row(path, sha256, backend_name)
+    try:
+        start = time.perf_counter()
+        audio = AudioSegment.from_file(path).set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+        row["duration_s"] = len(audio) / 1000
+        row["decode_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        backend = _get_backend(backend_name)
+        texts = []
+        for chunk_start, chunk_end in split_at_pauses(audio, int(chunk_seconds * 1000)):
+            chunk = audio[chunk_start:chunk_end]
+            wav = io.BytesIO()
+            chunk.export(wav, format="wav")
+            texts.append(backend.transcribe(wav.getvalue(), len(chunk) / 1000, language))
+        row["chunks"] = len(texts)
+        row["transcript"] = " ".join(t for t in texts if t)
+        row["transcribe_s"] = time.perf_counter() - start
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+# ===================== Output =====================
+def parts_dir(output_path):
+    return f"{output_path}.parts"
+
+
+def load_existing(output_path):
+    """Rows of the output plus any part files a previous run left behind, latest row per file"""
+    import pandas as pd
+
+    paths = ([output_path] if os.path.exists(output_path) else []) + sorted(
+        glob.glob(os.path.join(parts_dir(output_path), "*.parquet"))
+    )
+    if not paths:
+        return pd.DataFrame()
+    df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    return df.drop_duplicates("sha256", keep="last").reset_index(drop=True)
+
+
+def write_part(rows, output_path):
+    """Append rows as a new part file next to the output"""
+    import pandas as pd
+
+    directory = parts_dir(output_path)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"part-{time.time_ns()}.parquet")
+    pd.DataFrame(rows).to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def merge_parts(output_path):
+    """Fold the part files into the output file and remove them"""
+    df = load_existing(output_path)
+    if not len(df):
+        return df
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    shutil.rmtree(parts_dir(output_path), ignore_errors=True)
+    return df
+
+
+# ===================== Pipeline =====================
+def _transcribe_marked(marker_dir, path, sha256, *args):
+    """transcribe_recording, leaving a marker file while it runs so a crash can be traced to it"""
+    marker = os.path.join(marker_dir, sha256)
+    open(marker, "w").close()
+    row = transcribe_recording(path, sha256, *args)
+    os.remove(marker)
+    return row
+
+
+def _run_pool(pending, workers, args, marker_dir, on_row):
+    """Transcribe {sha256: path} in one pool; returns the files left unfinished by a worker crash"""
+    unfinished = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_transcribe_marked, marker_dir, path, sha256, *args): (sha256, path)
+            for sha256, path in pending.items()
+        }
+        for future in as_completed(futures):
+            sha256, path = futures[future]
+            try:
+                on_row(future.result())
+            except BrokenProcessPool:
+                unfinished[sha256] = path
+            except Exception as e:
+                on_row(empty_row(path, sha256, args[0], f"{type(e).__name__}: {e}"))
+    return unfinished
+
+
+def transcribe_all(pending, workers, args, on_row):
+    """Transcribe {sha256: path}, calling on_row(row) as each file finishes.
+
+    When a worker dies (BrokenProcessPool), files that had not started go to a fresh pool and
+    the ones that were running are retried one at a time, each in its own pool, so only the
+    recording that crashes a worker on its own is recorded as failed.
+    """
+    marker_dir = tempfile.mkdtemp(prefix="call_transcription_")
+    try:
+        while pending:
+            unfinished = _run_pool(pending, workers, args, marker_dir, on_row)
+            started = {sha256 for sha256 in unfinished if os.path.exists(os.path.join(marker_dir, sha256))}
+            if unfinished:
+                print(f"⚠️ A worker crashed: {len(started)} file(s) running retried alone, {len(unfinished) - len(started)} re-submitted")
+            for sha256 in started:
+                os.remove(os.path.join(marker_dir, sha256))
+                if _run_pool({sha256: unfinished[sha256]}, 1, args, marker_dir, on_row):
+                    os.remove(os.path.join(marker_dir, sha256))
+                    on_row(empty_row(unfinished[sha256], sha256, args[0], "Worker process crashed on this recording"))
+            pending = {sha256: path for sha256, path in unfinished.items() if sha256 not in started}
+    finally:
+        shutil.rmtree(marker_dir, ignore_errors=True)
+
+
+def run_pipeline(input_dir=DEFAULT_INPUT_DIR, output_path=DEFAULT_OUTPUT, backend="stub",
+                 workers=None, chunk_seconds=30.0, language=None, skip_failed=False, flush_rows=FLUSH_ROWS):
+    start = time.perf_counter()
+    # Includes the parts of an interrupted run; a retried file's new row replaces its failed one on merge
+    existing = load_existing(output_path)
+    if len(existing) and skip_failed:
+        done = set(existing["sha256"])
+    elif len(existing):
+        done = set(existing.loc[existing["error"].isna(), "sha256"])
+    else:
+        done = set()
+
+    paths = sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+    # Hashing is I/O bound and cheap next to decoding; duplicates (e.g. "- Copy" files) are done once
+    pending, skipped = {}, 0
+    for path in paths:
+        sha256 = file_sha256(path)
+        if sha256 in done or sha256 in pending:
+            skipped += 1
+        else:
+            pending[sha256] = path
+
+    print(f"🎧 {len(paths)} recordings, {skipped} skipped (already processed or duplicate), {len(pending)} to transcribe with '{backend}'")
+
+    rows, unflushed = [], []
+
+    def on_row(row):
+        nonlocal unflushed
+        rows.append(row)
+        unflushed.append(row)
+        status = f"❌ {row['error']}" if row["error"] else f"✅ {row['duration_s']:.0f}s audio, {row['chunks']} chunks"
+        print(f"[{len(rows)}/{len(pending)}] {row['file']} {status}")
+        if len(unflushed) >= flush_rows:
+            write_part(unflushed, output_path)
+            unflushed = []
+
+    try:
+        transcribe_all(pending, workers, (backend, chunk_seconds, language), on_row)
+    finally:
+        # Interrupted (e.g. Ctrl+C): keep what finished
+        if unflushed:
+            write_part(unflushed, output_path)
+
+    merge_parts(output_path)
+
+    wall_s = time.perf_counter() - start
+    ok_rows = [r for r in rows if not r["error"]]
+    audio_s = sum(r["duration_s"] for r in ok_rows)
+    compute_s = sum(r["decode_s"] + r["transcribe_s"] for r in ok_rows)
+    report = {
+        "processed": len(ok_rows),
+        "failed": len(rows) - len(ok_rows),
+        "skipped": skipped,
+        "wall_s": round(wall_s, 2),
+        "audio_minutes": round(audio_s / 60, 2),
+        "files_per_minute": round(len(ok_rows) / wall_s * 60, 2) if wall_s else 0.0,
+        # < 1 means faster than real time
+        "real_time_factor": round(wall_s / audio_s, 4) if audio_s else None,
+        "per_worker_real_time_factor": round(compute_s / audio_s, 4) if audio_s else None,
+    }
+    return report
+
+
+# ===================== Entry =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe call recordings in parallel")
+    parser.add_argument("--input-dir", default=DEFAULT_INPUT_DIR)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--backend", default="stub", choices=sorted(BACKENDS))
+    parser.add_argument("--workers", type=int, default=None, help="Default: number of CPUs")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0, help="Longest chunk; chunks are cut at pauses")
+    parser.add_argument("--language", default=None, help="e.g. hi or en; default lets the backend detect it")
+    parser.add_argument("--skip-failed", action="store_true", help="Don't retry files that failed in a previous run")
+    parser.add_argument("--flush-rows", type=int, default=FLUSH_ROWS, help="Rows per part file written during the run")
+    args = parser.parse_args(argv)
+
+    report = run_pipeline(
+        input_dir=args.input_dir,
+        output_path=args.output,
+        backend=args.backend,
+        workers=args.workers,
+        chunk_seconds=args.chunk_seconds,
+        language=args.language,
+        skip_failed=args.skip_failed,
+        flush_rows=args.flush_rows,
+    )
+
+    print("\n📊 Report")
+    for key, value in report.items():
+        print(f"{key:<28}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# chroma_pool.py
+# Process-wide pool of Chroma clients, and one shared store for all assistants.
+#
+# VECTOR_STORE_MODE=shared keeps every assistant as its own collection in a
+# single persistent store (SHARED_VECTOR_DB_PATH) behind one client per
+# process, instead of a separate sqlite store per Context/<id>/db.
+#
+# Either way clients come from this pool. In per_context mode it caps how
+# many collections (each with its HNSW index) stay resident at
+# VECTOR_MAX_RESIDENT_INDEXES. chromadb 1.x has no way to unload one
+# collection (its Rust bindings keep every HNSW reader they have opened until
+# the client is stopped, and ignore the segment cache settings), so past the
+# cap the least recently used client with no live vector store is closed,
+# which frees its index. A client still held (e.g. by a retriever kept across
+# requests) is never closed, so under sustained load the cap is reached at the
+# next idle moment.
+#
+# Shared mode has no cap: its one client holds every index, and closing it
+# would drop them all at once. Size the process for all collections a worker
+# serves, or use per_context mode where memory must stay bounded.
+#
+# Import existing per-directory stores with:
+#   python -m modules.chroma_pool migrate
+
+import os
+import weakref
+import argparse
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from prometheus_client import Gauge
+
+VECTOR_STORE_MODE = os.getenv("VECTOR_STORE_MODE", "per_context")
+SHARED_VECTOR_DB_PATH = os.getenv("SHARED_VECTOR_DB_PATH", "Context/_shared_db")
+VECTOR_MAX_RESIDENT_INDEXES = int(os.getenv("VECTOR_MAX_RESIDENT_INDEXES", "64"))
+
+RESIDENT_INDEXES = Gauge(
+    "voicebot_vector_resident_indexes",
+    "Collections opened through a pooled Chroma client that is still open",
+    multiprocess_mode="livesum",
+)
+
+_clients = {}
+# (path, collection) -> live vector stores built on the path's client
+_holders = {}
+# (path, collection) -> callers borrowing the client right now (see borrow_client)
+_borrowed = Counter()
+# (path, collection) in least recently used order
+_resident = OrderedDict()
+_clients_lock = threading.RLock()
+
+
+def shared_mode():
+    return VECTOR_STORE_MODE == "shared"
+
+
+# ===================== Client Pool =====================
+def get_client(path=SHARED_VECTOR_DB_PATH):
+    """Process-wide Chroma client for a store path, created once (until closed)"""
+    path = os.path.normpath(path)
+    with _clients_lock:
+        client = _clients.get(path)
+        if client is None:
+            import chromadb
+            from chromadb.config import Settings
+
+            os.makedirs(path, exist_ok=True)
+            client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+            _clients[path] = client
+        return client
+
+
+def in_use(path, collection=None):
+    """True if a live vector store or a borrower in this process uses the path's client (for collection)"""
+    path = os.path.normpath(path)
+    with _clients_lock:
+        keys = {key for key in list(_holders) + list(_borrowed) if key[0] == path}
+        if collection is not None:
+            keys &= {(path, collection)}
+        return any(_holders.get(key) or _borrowed[key] for key in keys)
+
+
+def release_client(path):
+    """Close the path's client unless it is in use; returns whether it is closed"""
+    path = os.path.normpath(path)
+    with _clients_lock:
+        if in_use(path):
+            return False
+        client = _clients.pop(path, None)
+        for key in [key for key in _resident if key[0] == path]:
+            del _resident[key]
+        for key in [key for key in _holders if key[0] == path]:
+            del _holders[key]
+        RESIDENT_INDEXES.set(len(_resident))
+    if client is not None:
+        # Stops the system once this was its last client, dropping its HNSW indexes
+        client.close()
+    return True
+
+
+def forget_collection(path, collection):
+    """Stop tracking a collection that was deleted from the path's store"""
+    key = (os.path.normpath(path), collection)
+    with _clients_lock:
+        _resident.pop(key, None)
+        _holders.pop(key, None)
+        RESIDENT_INDEXES.set(len(_resident))
+
+
+def _make_room(max_resident):
+    if shared_mode():
+        return
+    for path in list(dict.fromkeys(path for path, _ in _resident)):
+        if len(_resident) < max_resident:
+            return
+        release_client(path)
+
+
+def open_vector_store(path, collection, make_store, max_resident=VECTOR_MAX_RESIDENT_INDEXES):
+    """make_store(client) for a collection at path, tracked as a live holder of the client.
+
+    Opening a collection that is not resident yet first closes least recently used idle clients
+    past max_resident (per_context mode only). Runs under the pool lock, so a client is never
+    closed while a store is being built on it.
+    """
+    path = os.path.normpath(path)
+    key = (path, collection)
+    with _clients_lock:
+        if key not in _resident:
+            _make_room(max_resident)
+        store = make_store(get_client(path))
+        _holders.setdefault(key, weakref.WeakSet()).add(store)
+        _resident[key] = True
+        _resident.move_to_end(key)
+        RESIDENT_INDEXES.set(len(_resident))
+        return store
+
+
+@contextmanager
+def borrow_client(path, collection):
+    """The path's client, kept open (and counted as in use for collection) until the block exits"""
+    path = os.path.normpath(path)
+    key = (path, collection)
+    with _clients_lock:
+        client = get_client(path)
+        _borrowed[key] += 1
+    try:
+        yield client
+    finally:
+        with _clients_lock:
+            _borrowed[key] -= 1
+            if not _borrowed[key]:
+                del _borrowed[key]
+
+
+def collection_name(session_id):
+    return f"{session_id}_collection"
+
+
+# ===================== Migration =====================
+def _names(client):
+    # list_collections returns names in newer Chroma, Collection objects in older
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+def migrate_context_stores(context_root="Context", dest_path=SHARED_VECTOR_DB_PATH, batch_size=500):
+    """Copy every Context/<id>/db collection (with its embeddings) into the shared store"""
+    import chromadb
+
+    dest = get_client(dest_path)
+    report = []
+    for entry in sorted(os.listdir(context_root)):
+        db_dir = os.path.join(context_root, entry, "db")
+        if not os.path.exists(os.path.join(db_dir, "chroma.sqlite3")):
+            continue
+
+        source = chromadb.PersistentClient(path=db_dir)
+        for name in _names(source):
+            collection = source.get_collection(name)
+            target = dest.get_or_create_collection(name, metadata=collection.metadata or None)
+            copied = 0
+            while True:
+                batch = collection.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=batch_size,
+                    offset=copied,
+                )
+                if not batch["ids"]:
+                    break
+                metadatas = batch["metadatas"]
+                target.upsert(
+                    ids=batch["ids"],
+                    embeddings=batch["embeddings"],
+                    documents=batch["documents"],
+                    metadatas=metadatas if any(metadatas) else None,
+                )
+                copied += len(batch["ids"])
+            report.append((entry, name, copied))
+            print(f"✅ {entry}: {name} ({copied} vectors)")
+        source.close()
+    return report
+
+
+# ===================== Entry =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared Chroma store tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate = subcommands.add_parser("migrate", help="Import Context/*/db stores into the shared store")
+    migrate.add_argument("--context-root", default="Context")
+    migrate.add_argument("--dest", default=SHARED_VECTOR_DB_PATH)
+    migrate.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        report = migrate_context_stores(args.context_root, args.dest, args.batch_size)
+        print(f"\n📦 Migrated {len(report)} collections, {sum(n for _, _, n in report)} vectors into {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
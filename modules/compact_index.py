@@ -0,0 +1,232 @@
+# compact_index.py
+# Compact vector index: int8 codes (one scale per vector) scanned in chunks,
+# then an exact re-rank of the best candidates against the float32 vectors.
+# Both arrays are memory-mapped, so only the int8 codes (~1/4 of the float32
+# size) need to be resident; float32 rows are paged in for candidates only.
+#
+# Selected with VECTOR_BACKEND=compact (see modules/vector.py). The index is
+# built from the assistant's Chroma collection, reusing its stored embeddings.
+
+import os
+import json
+import uuid
+import hashlib
+import threading
+import numpy as np
+from typing import Any, List, Optional
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+CODES_FILE = "codes.npy"
+SCALES_FILE = "scales.npy"
+NORMS_FILE = "norms.npy"
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.json"
+# Next to the store's .indexed marker: collection_signature as of the last write to the collection
+SIGNATURE_FILE = ".vectors"
+
+# Candidates re-ranked exactly per result returned
+RERANK_FACTOR = int(os.getenv("COMPACT_RERANK_FACTOR", "8"))
+# Rows dequantized at a time while scanning, bounds the float32 scratch memory
+SCAN_CHUNK_ROWS = 2048
+
+
+# ===================== Index =====================
+class CompactIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        self.codes = np.load(os.path.join(directory, CODES_FILE), mmap_mode="r")
+        self.scales = np.load(os.path.join(directory, SCALES_FILE))
+        self.norms = np.load(os.path.join(directory, NORMS_FILE))
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, DOCS_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.metric = meta["metric"]
+        self.ids = meta["ids"]
+        self.documents = meta["documents"]
+        self.metadatas = meta["metadatas"]
+        # Content of the collection the index was built from (see collection_signature)
+        self.signature = meta.get("signature")
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def resident_bytes(self):
+        """Memory needed to keep the scan fast: int8 codes plus per-vector scalars"""
+        return self.codes.nbytes + self.scales.nbytes + self.norms.nbytes
+
+    @staticmethod
+    def build(directory, ids, embeddings, documents, metadatas, metric="l2", signature=None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if metric == "cosine":
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+
+        # Write next to the index and rename into place: open memory maps of a
+        # previous build keep their (unlinked) files instead of seeing them truncated.
+        # Each build stages in its own directory so concurrent builds (other workers) never mix files.
+        staging = f"{directory}.building-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(staging, exist_ok=True)
+        np.save(os.path.join(staging, CODES_FILE), codes)
+        np.save(os.path.join(staging, SCALES_FILE), scales.astype(np.float32))
+        np.save(os.path.join(staging, NORMS_FILE), np.einsum("ij,ij->i", vectors, vectors).astype(np.float32))
+        np.save(os.path.join(staging, VECTORS_FILE), vectors)
+        with open(os.path.join(staging, DOCS_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "metric": metric,
+                "ids": list(ids),
+                "documents": list(documents),
+                "metadatas": [m or {} for m in metadatas],
+                "signature": signature,
+            }, f, ensure_ascii=False)
+
+        os.makedirs(directory, exist_ok=True)
+        for name in (CODES_FILE, SCALES_FILE, NORMS_FILE, VECTORS_FILE, DOCS_FILE):
+            os.replace(os.path.join(staging, name), os.path.join(directory, name))
+        os.rmdir(staging)
+        return CompactIndex(directory)
+
+    def _prepare(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.metric == "cosine":
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        return queries
+
+    def _scores(self, dots, norms):
+        # Lower is better. l2: |x|^2 - 2 x.q (|q|^2 is the same for every row)
+        return norms[:, None] - 2 * dots if self.metric == "l2" else -dots
+
+    def search_many(self, queries, k=10):
+        """Row indices of the k nearest vectors for each query"""
+        queries = self._prepare(queries)
+        if not len(self):
+            return [[] for _ in queries]
+        k = min(k, len(self))
+        n_candidates = min(len(self), k * RERANK_FACTOR)
+
+        # 1) Approximate scan over the int8 codes
+        approx = np.empty((len(self), len(queries)), dtype=np.float32)
+        for start in range(0, len(self), SCAN_CHUNK_ROWS):
+            chunk = self.codes[start:start + SCAN_CHUNK_ROWS].astype(np.float32)
+            dots = (chunk @ queries.T) * self.scales[start:start + SCAN_CHUNK_ROWS, None]
+            approx[start:start + len(chunk)] = self._scores(dots, self.norms[start:start + SCAN_CHUNK_ROWS])
+
+        # 2) Exact re-rank of the candidates against float32 vectors
+        results = []
+        for column, query in enumerate(queries):
+            candidates = np.argpartition(approx[:, column], n_candidates - 1)[:n_candidates]
+            candidates.sort()  # sequential reads from the memory map
+            exact_dots = self.vectors[candidates] @ query
+            exact = self._scores(exact_dots[:, None], self.norms[candidates])[:, 0]
+            results.append(candidates[np.argsort(exact)[:k]].tolist())
+        return results
+
+    def documents_for(self, rows):
+        return [Document(page_content=self.documents[i], metadata=self.metadatas[i]) for i in rows]
+
+
+# ===================== Per-session Cache =====================
+_indexes = {}
+# Guards _indexes and _session_locks only; a build holds just its session's lock
+_indexes_lock = threading.Lock()
+_session_locks = {}
+
+
+def index_dir(session_id):
+    return f"Context/{session_id}/compact"
+
+
+def _session_lock(session_id):
+    with _indexes_lock:
+        return _session_locks.setdefault(session_id, threading.Lock())
+
+
+def collection_signature(collection, count, batch_size=1000):
+    """Hash of the collection's sorted ids: changes when vectors are added, removed or replaced
+
+    Ids are content hashes (see modules/vector.document_id), so the same ids mean the same vectors.
+    """
+    ids = []
+    for offset in range(0, count, batch_size):
+        ids.extend(collection.get(include=[], limit=batch_size, offset=offset)["ids"])
+    return hashlib.sha256("\n".join(sorted(ids)).encode()).hexdigest()
+
+
+def signature_path(session_id):
+    return f"Context/{session_id}/{SIGNATURE_FILE}"
+
+
+def record_signature(session_id, collection, batch_size=1000):
+    """Store the collection's signature; called by whatever writes to the collection"""
+    signature = collection_signature(collection, collection.count(), batch_size)
+    path = signature_path(session_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    with open(tmp_path, "w") as f:
+        f.write(signature)
+    os.replace(tmp_path, path)
+    return signature
+
+
+def stored_signature(session_id):
+    try:
+        with open(signature_path(session_id)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_index_for_collection(session_id, collection, batch_size=1000):
+    """Compact index for a session, rebuilt from its Chroma collection when the collection has changed.
+
+    Uses the signature recorded at write time; the ids are only paged through when none was recorded yet.
+    Returns None for an empty collection.
+    """
+    directory = index_dir(session_id)
+    count = collection.count()
+    if not count:
+        return None
+    with _session_lock(session_id):
+        signature = stored_signature(session_id) or record_signature(session_id, collection, batch_size)
+        with _indexes_lock:
+            index = _indexes.get(session_id)
+        if index is None and os.path.exists(os.path.join(directory, DOCS_FILE)):
+            index = CompactIndex(directory)
+        # The count catches writes that bypassed record_signature
+        if index is None or index.signature != signature or len(index) != count:
+            ids, embeddings, documents, metadatas = [], [], [], []
+            for offset in range(0, count, batch_size):
+                batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+                ids.extend(batch["ids"])
+                embeddings.extend(batch["embeddings"])
+                documents.extend(batch["documents"])
+                metadatas.extend(batch["metadatas"])
+            metric = (collection.metadata or {}).get("hnsw:space", "l2")
+            index = CompactIndex.build(directory, ids, embeddings, documents, metadatas, metric=metric, signature=signature)
+        with _indexes_lock:
+            _indexes[session_id] = index
+        return index
+
+
+# ===================== Retriever =====================
+class CompactRetriever(BaseRetriever):
+    index: Any
+    embeddings: Any
+    k: int = 10
+    # Assistant/session whose use is recorded on every query (see modules/context_store.py)
+    store: Optional[str] = None
+    # The session's Chroma store, held so the store counts as in use (and is not evicted) while the retriever lives
+    vectorstore: Any = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.search_by_vector(self.embeddings.embed_query(query))
+
+    def search_by_vector(self, embedding) -> List[Document]:
+        """Same search for an already embedded query"""
+        if self.store:
+            from modules.context_store import ensure_available
+            ensure_available(self.store)
+        rows = self.index.search_many([embedding], k=self.k)[0]
+        return self.index.documents_for(rows)
@@ -0,0 +1,485 @@
+# context_store.py
+# Lifecycle of the per-assistant/per-session stores under Context/:
+# deduplicate vectors, VACUUM the sqlite files, and move stores that have not
+# been used for CONTEXT_EVICT_AFTER_DAYS into cold storage (one .tar.gz per
+# store in CONTEXT_COLD_DIR). An evicted store is rehydrated transparently the
+# next time it is used (get_vector_db_for_session calls ensure_available).
+#
+#   python -m modules.context_store status
+#   python -m modules.context_store maintain [--idle-days 14] [--dry-run]
+#   python -m modules.context_store run --interval 3600      (daemon)
+#   python -m modules.context_store evict <name> | rehydrate <name>
+#
+# Setting CONTEXT_MAINTENANCE_INTERVAL_S runs the same loop inside the API
+# process instead, which is the safer choice with VECTOR_STORE_MODE=shared.
+# Every worker runs the loop, but a lock file lets only one of them do each
+# pass. A store that a live vector store in the process still uses is never
+# evicted.
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import tarfile
+import argparse
+import threading
+from contextlib import contextmanager
+from prometheus_client import Histogram
+from modules.chroma_pool import (
+    SHARED_VECTOR_DB_PATH,
+    borrow_client,
+    collection_name,
+    forget_collection,
+    get_client,
+    in_use,
+    release_client,
+    shared_mode,
+)
+from modules.sessions import context_kind, get_context_index
+
+CONTEXT_ROOT = "Context"
+COLD_STORAGE_DIR = os.getenv("CONTEXT_COLD_DIR", "cold_storage")
+EVICT_AFTER_DAYS = float(os.getenv("CONTEXT_EVICT_AFTER_DAYS", "14"))
+MAINTENANCE_INTERVAL_S = float(os.getenv("CONTEXT_MAINTENANCE_INTERVAL_S", "0"))
+
+# Shared-mode collections are exported into the store directory before it is archived
+EXPORT_FILE = "collection.npz"
+
+LOCK_DIR = os.path.join(COLD_STORAGE_DIR, ".locks")
+# Held by the process running a maintenance pass; the file next to it has the time the last pass started
+MAINTENANCE_LOCK = "_maintenance"
+LAST_PASS_FILE = os.path.join(LOCK_DIR, "_maintenance.last")
+
+REHYDRATION_SECONDS = Histogram(
+    "voicebot_context_rehydration_seconds",
+    "Time to restore an evicted store from cold storage",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+def store_dir(name):
+    return os.path.join(CONTEXT_ROOT, name)
+
+
+def archive_path(name):
+    return os.path.join(COLD_STORAGE_DIR, f"{name}.tar.gz")
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+def _lock(f, blocking):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.05)
+    import fcntl
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(name, blocking=True):
+    """Cross-process lock; yields whether it was acquired (always True when blocking)"""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, f"{name}.lock"), "a+b") as f:
+        acquired = _lock(f, blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _unlock(f)
+
+
+@contextmanager
+def store_lock(name):
+    """Cross-process lock for evicting/rehydrating one store"""
+    with file_lock(name):
+        yield
+
+
+def db_path(name):
+    """Chroma store holding the collection of an assistant/session"""
+    return SHARED_VECTOR_DB_PATH if shared_mode() else os.path.join(store_dir(name), "db")
+
+
+def _release_handles(name):
+    """Close this process's pooled client and compact index for a store that is moving.
+
+    Returns False (and closes nothing) if a live vector store still uses the store.
+    """
+    if in_use(db_path(name), collection_name(name)):
+        return False
+    if not shared_mode() and not release_client(db_path(name)):
+        return False
+    compact_index = sys.modules.get("modules.compact_index")
+    if compact_index is not None:
+        compact_index._indexes.pop(name, None)
+    return True
+
+
+# ===================== Collections =====================
+@contextmanager
+def open_collection(name):
+    """The store's Chroma collection, or None if it has none.
+
+    Borrowed from the client pool for the duration of the block; a per-context
+    client that nothing else uses is closed afterwards.
+    """
+    path = db_path(name)
+    if not shared_mode() and not os.path.exists(os.path.join(path, "chroma.sqlite3")):
+        yield None
+        return
+    with borrow_client(path, collection_name(name)) as client:
+        try:
+            collection = client.get_collection(collection_name(name))
+        except Exception:
+            collection = None
+        yield collection
+    if not shared_mode():
+        release_client(path)
+
+
+def deduplicate(collection, batch_size=1000, dry_run=False):
+    """Delete vectors whose document and metadata repeat an earlier one; returns how many"""
+    seen, duplicates = set(), []
+    offset = 0
+    while True:
+        batch = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        for id_, document, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+            key = json.dumps([document, metadata or {}], sort_keys=True, ensure_ascii=False, default=str)
+            if key in seen:
+                duplicates.append(id_)
+            else:
+                seen.add(key)
+        offset += len(batch["ids"])
+    if not dry_run:
+        for start in range(0, len(duplicates), batch_size):
+            collection.delete(ids=duplicates[start:start + batch_size])
+    return len(duplicates)
+
+
+def vacuum(sqlite_path):
+    """VACUUM a Chroma sqlite file; returns bytes reclaimed"""
+    before = os.path.getsize(sqlite_path)
+    conn = sqlite3.connect(sqlite_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return before - os.path.getsize(sqlite_path)
+
+
+def _export_collection(name, directory):
+    import numpy as np
+
+    with open_collection(name) as collection:
+        if collection is None:
+            return False
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        records = {
+            "ids": data["ids"],
+            "documents": data["documents"],
+            "metadatas": data["metadatas"],
+            "metadata": collection.metadata,
+        }
+    np.savez_compressed(
+        os.path.join(directory, EXPORT_FILE),
+        embeddings=np.asarray(data["embeddings"], dtype=np.float32),
+        records=np.array(json.dumps(records, ensure_ascii=False)),
+    )
+    return True
+
+
+def _import_collection(name, directory, batch_size=500):
+    import numpy as np
+
+    path = os.path.join(directory, EXPORT_FILE)
+    if not os.path.exists(path):
+        return
+    with np.load(path) as data:
+        embeddings = data["embeddings"]
+        records = json.loads(str(data["records"]))
+    collection = get_client().get_or_create_collection(collection_name(name), metadata=records["metadata"] or None)
+    for start in range(0, len(records["ids"]), batch_size):
+        end = start + batch_size
+        metadatas = records["metadatas"][start:end]
+        collection.upsert(
+            ids=records["ids"][start:end],
+            embeddings=embeddings[start:end],
+            documents=records["documents"][start:end],
+            metadatas=metadatas if any(metadatas) else None,
+        )
+    os.remove(path)
+
+
+# ===================== Eviction / Rehydration =====================
+def evict(name, idle_seconds=None):
+    """Archive a store to cold storage and remove it from Context/; returns local bytes freed (0 if skipped)
+
+    With idle_seconds, the store is only evicted if it is still idle once locked. A store that a
+    live vector store in this process uses (e.g. a retriever kept in a Streamlit session) is skipped.
+    """
+    index = get_context_index(CONTEXT_ROOT)
+    directory = store_dir(name)
+
+    def still_idle():
+        if in_use(db_path(name), collection_name(name)):
+            return False
+        last_access = index.store_states().get(name, {}).get("last_access")
+        return idle_seconds is None or not last_access or time.time() - last_access >= idle_seconds
+
+    with store_lock(name):
+        if not os.path.isdir(directory) or not still_idle():
+            return 0
+        freed = dir_size(directory)
+        # In shared mode the vectors live in the shared store: export them next to the docs.
+        # Their pages in the shared sqlite are freed by the next VACUUM of that store.
+        if shared_mode():
+            _export_collection(name, directory)
+
+        os.makedirs(COLD_STORAGE_DIR, exist_ok=True)
+        tmp_path = f"{archive_path(name)}.tmp"
+        with tarfile.open(tmp_path, "w:gz") as archive:
+            archive.add(directory, arcname=name)
+
+        # Used while archiving: keep it hot
+        if not still_idle() or not _release_handles(name):
+            os.remove(tmp_path)
+            export = os.path.join(directory, EXPORT_FILE)
+            if os.path.exists(export):
+                os.remove(export)
+            return 0
+
+        os.replace(tmp_path, archive_path(name))
+        if shared_mode():
+            try:
+                get_client().delete_collection(collection_name(name))
+            except Exception:
+                pass
+            forget_collection(SHARED_VECTOR_DB_PATH, collection_name(name))
+        evicting = f"{directory}.evicting"
+        os.replace(directory, evicting)
+        shutil.rmtree(evicting, ignore_errors=True)
+        index.set_tier(name, "cold")
+        return freed
+
+
+def rehydrate(name):
+    """Restore an evicted store; returns the time it took in ms, or None if there was nothing to restore"""
+    index = get_context_index(CONTEXT_ROOT)
+    with store_lock(name):
+        if os.path.isdir(store_dir(name)) or not os.path.exists(archive_path(name)):
+            return None
+        start = time.perf_counter()
+        with tarfile.open(archive_path(name), "r:gz") as archive:
+            archive.extractall(CONTEXT_ROOT, filter="data")
+        if shared_mode():
+            _import_collection(name, store_dir(name))
+        # A client this process still had open (the store was evicted by another process) reads deleted files
+        _release_handles(name)
+        # The store will change from here on, so the archive is stale
+        os.remove(archive_path(name))
+        elapsed = time.perf_counter() - start
+        REHYDRATION_SECONDS.observe(elapsed)
+        index.set_tier(name, "hot", rehydrate_ms=round(elapsed * 1000, 2))
+        print(f"♻️ Rehydrated {name} from cold storage in {elapsed * 1000:.0f} ms")
+        return elapsed * 1000
+
+
+def ensure_available(name):
+    """Record a use of a store, restoring it from cold storage first if it was evicted"""
+    if not context_kind(name):
+        return
+    index = get_context_index(CONTEXT_ROOT)
+    # Touch before use so a concurrent eviction's idle check sees it
+    index.touch(name)
+    if not os.path.isdir(store_dir(name)) and os.path.exists(archive_path(name)):
+        rehydrate(name)
+        index.touch(name, force=True)
+
+
+# ===================== Maintenance =====================
+def known_stores():
+    index = get_context_index(CONTEXT_ROOT)
+    names = set(index.names("session")) | set(index.names("assistant")) | set(index.store_states())
+    names.update(d for d in os.listdir(CONTEXT_ROOT) if context_kind(d) and os.path.isdir(store_dir(d)))
+    return sorted(names)
+
+
+def maintain(idle_days=EVICT_AFTER_DAYS, dry_run=False):
+    """One maintenance pass over every store; returns a report row per store"""
+    index = get_context_index(CONTEXT_ROOT)
+    states = index.store_states()
+    idle_seconds = idle_days * 86400
+    rows = []
+    for name in known_stores():
+        directory = store_dir(name)
+        state = states.get(name, {})
+        row = {"store": name, "tier": "hot", "idle_days": None, "duplicates": 0, "vacuumed_bytes": 0, "evicted_bytes": 0,
+               "rehydrate_ms": state.get("rehydrate_ms")}
+        if not os.path.isdir(directory):
+            row["tier"] = "cold" if os.path.exists(archive_path(name)) else "missing"
+            rows.append(row)
+            continue
+
+        # Never used since tracking began: fall back to the directory's modification time
+        last_access = state.get("last_access") or os.path.getmtime(directory)
+        row["idle_days"] = round((time.time() - last_access) / 86400, 1)
+
+        try:
+            with open_collection(name) as collection:
+                if collection is not None:
+                    row["duplicates"] = deduplicate(collection, dry_run=dry_run)
+                    if row["duplicates"] and not dry_run:
+                        from modules.compact_index import record_signature
+                        record_signature(name, collection)
+            sqlite_path = os.path.join(directory, "db", "chroma.sqlite3")
+            if not dry_run and not shared_mode() and os.path.exists(sqlite_path):
+                row["vacuumed_bytes"] = vacuum(sqlite_path)
+            if time.time() - last_access >= idle_seconds:
+                row["evicted_bytes"] = dir_size(directory) if dry_run else evict(name, idle_seconds)
+                if row["evicted_bytes"]:
+                    row["tier"] = "cold"
+        except Exception as e:
+            row["error"] = str(e)
+        rows.append(row)
+
+    if not dry_run and shared_mode():
+        shared_sqlite = os.path.join(SHARED_VECTOR_DB_PATH, "chroma.sqlite3")
+        if os.path.exists(shared_sqlite):
+            try:
+                rows.append({"store": "_shared", "tier": "hot", "vacuumed_bytes": vacuum(shared_sqlite)})
+            except Exception as e:
+                rows.append({"store": "_shared", "tier": "hot", "error": str(e)})
+    return rows
+
+
+def print_report(rows, dry_run=False):
+    print(f"{'store':<48}{'tier':<8}{'idle d':>8}{'dupes':>8}{'vacuum KB':>11}{'evict KB':>10}{'rehydr ms':>11}")
+    for row in rows:
+        idle = "" if row.get("idle_days") is None else row["idle_days"]
+        rehydrate_ms = "" if row.get("rehydrate_ms") is None else f"{row['rehydrate_ms']:.0f}"
+        print(f"{row['store']:<48}{row['tier']:<8}{idle:>8}{row.get('duplicates', 0):>8}"
+              f"{row.get('vacuumed_bytes', 0) / 1024:>11.1f}{row.get('evicted_bytes', 0) / 1024:>10.1f}{rehydrate_ms:>11}"
+              + (f"  ❌ {row['error']}" if row.get("error") else ""))
+    reclaimed = sum(row.get("vacuumed_bytes", 0) + row.get("evicted_bytes", 0) for row in rows)
+    rehydrations = [row["rehydrate_ms"] for row in rows if row.get("rehydrate_ms") is not None]
+    print(f"\n📦 {'Would reclaim' if dry_run else 'Reclaimed'} {reclaimed / 1024 / 1024:.2f} MB locally, "
+          f"{sum(row.get('duplicates', 0) for row in rows)} duplicate vectors"
+          + (f", last rehydration avg {sum(rehydrations) / len(rehydrations):.0f} ms" if rehydrations else ""))
+
+
+def maintain_if_due(interval_s=MAINTENANCE_INTERVAL_S, idle_days=EVICT_AFTER_DAYS):
+    """One maintenance pass, unless another process is running one or started one recently.
+
+    Every API worker runs the maintenance loop; this makes sure only one of them does each
+    pass. Returns the report rows, or None if the pass was left to another process.
+    """
+    with file_lock(MAINTENANCE_LOCK, blocking=False) as acquired:
+        if not acquired:
+            return None
+        try:
+            with open(LAST_PASS_FILE) as f:
+                last_pass = float(f.read())
+        except (OSError, ValueError):
+            last_pass = 0.0
+        # Workers wake at different times within an interval: half an interval apart is the same pass
+        if time.time() - last_pass < interval_s / 2:
+            return None
+        with open(LAST_PASS_FILE, "w") as f:
+            f.write(str(time.time()))
+        return maintain(idle_days)
+
+
+def run_forever(interval_s=MAINTENANCE_INTERVAL_S, idle_days=EVICT_AFTER_DAYS):
+    while True:
+        try:
+            rows = maintain_if_due(interval_s, idle_days)
+            if rows is not None:
+                print_report(rows)
+        except Exception as e:
+            print("❌ Context maintenance failed:", e)
+        time.sleep(interval_s)
+
+
+def start_maintenance_thread():
+    """Run maintenance in the background of this process if CONTEXT_MAINTENANCE_INTERVAL_S is set"""
+    if MAINTENANCE_INTERVAL_S <= 0:
+        return None
+    thread = threading.Thread(target=run_forever, name="context-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+# ===================== Entry =====================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Context store maintenance")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("status", help="List stores with tier, idle time and size")
+    for command in ("maintain", "run"):
+        sub = subcommands.add_parser(command, help="One maintenance pass" if command == "maintain" else "Maintain every --interval seconds")
+        sub.add_argument("--idle-days", type=float, default=EVICT_AFTER_DAYS)
+        if command == "maintain":
+            sub.add_argument("--dry-run", action="store_true")
+        else:
+            sub.add_argument("--interval", type=float, default=MAINTENANCE_INTERVAL_S or 3600)
+    for command in ("evict", "rehydrate"):
+        subcommands.add_parser(command).add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        states = get_context_index(CONTEXT_ROOT).store_states()
+        for name in known_stores():
+            state = states.get(name, {})
+            hot = os.path.isdir(store_dir(name))
+            size = dir_size(store_dir(name)) if hot else (os.path.getsize(archive_path(name)) if os.path.exists(archive_path(name)) else 0)
+            last = time.strftime("%Y-%m-%d %H:%M", time.localtime(state["last_access"])) if state.get("last_access") else "never"
+            print(f"{name:<48}{'hot' if hot else 'cold':<6}{size / 1024:>10.1f} KB  last used {last}")
+    elif args.command == "maintain":
+        # Waits for a pass another process is running
+        with file_lock(MAINTENANCE_LOCK):
+            print_report(maintain(args.idle_days, args.dry_run), args.dry_run)
+    elif args.command == "run":
+        run_forever(args.interval, args.idle_days)
+    elif args.command == "evict":
+        print(f"📦 Evicted {args.name}: {evict(args.name) / 1024:.1f} KB freed")
+    elif args.command == "rehydrate":
+        elapsed = rehydrate(args.name)
+        print(f"♻️ {args.name}: " + ("nothing to restore" if elapsed is None else f"rehydrated in {elapsed:.0f} ms"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# language_id.py
+# Hindi / English identification for user utterances, shared by the CLI voice
+# loop and the API. Handles Devanagari, romanized Hindi (Hinglish) and English.
+# For transcribed speech, Whisper's detected language is the main signal and
+# the lexicon only decides between Hindi (incl. Hinglish) and English.
+
+import re
+from functools import lru_cache
+
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+LETTER = re.compile(r"[^\W\d_]")
+TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Share of letters in Devanagari above which text is Hindi outright
+DEVANAGARI_RATIO = 0.3
+# Share of lexicon hits that must be Hinglish for romanized text to count as Hindi
+HINGLISH_SHARE = 0.4
+
+# Romanized Hindi words common in customer queries (words that are also common English words are left out)
+HINGLISH_WORDS = frozenset("""
+    aap aapka aapke aapki aap ka ke ki ko se mein mai mera meri mere mujhe mujhko hum humko hamara hamare
+    tum tumhara tera hai hain tha thi hoga hogi honge ho raha rahi rahe kya kyun kyon kaise kaisa kaisi kab
+    kahan kaun kitna kitni kitne kuch koi nahi nahin na haan han ji accha acha theek thik bhi aur ya lekin
+    magar toh agar yeh ye woh vo wo yahan wahan abhi pehle baad saath liye bataiye batao batayiye bolo
+    boliye samjhao samjhaiye chahiye chahta chahti karna karo kariye karke kar karta karti karte milega milta
+    milti milenge paisa paise rupaye lagana lagaya madat madad naam sahi galat bahut zyada kam thoda
+    jaldi pata samajh baare wala wali wale sakta sakti sakte dijiye dena lena lijiye hoon hu kripya dhanyavaad
+    shukriya namaste
+""".split())
+
+# Frequent English words, used to outweigh a stray Hinglish token in an English sentence
+ENGLISH_WORDS = frozenset("""
+    a an the is are was were be been am do does did have has had i you he she it we they me my your our their
+    this that these those what which who whom whose when where why how can could will would should may might
+    must shall of in on at by for with about from to into over under and or but if then so not no yes please
+    tell explain want need invest investment return returns interest money loan loans safe risk account
+    minimum maximum amount rate lending lender platform there here any some all much many more most
+""".split())
+
+
+# Languages Whisper detects: code -> name (verbose_json reports the name)
+WHISPER_LANGUAGES = {
+    "en": "english", "zh": "chinese", "de": "german", "es": "spanish", "ru": "russian", "ko": "korean",
+    "fr": "french", "ja": "japanese", "pt": "portuguese", "tr": "turkish", "pl": "polish", "ca": "catalan",
+    "nl": "dutch", "ar": "arabic", "sv": "swedish", "it": "italian", "id": "indonesian", "hi": "hindi",
+    "fi": "finnish", "vi": "vietnamese", "he": "hebrew", "uk": "ukrainian", "el": "greek", "ms": "malay",
+    "cs": "czech", "ro": "romanian", "da": "danish", "hu": "hungarian", "ta": "tamil", "no": "norwegian",
+    "th": "thai", "ur": "urdu", "hr": "croatian", "bg": "bulgarian", "lt": "lithuanian", "la": "latin",
+    "mi": "maori", "ml": "malayalam", "cy": "welsh", "sk": "slovak", "te": "telugu", "fa": "persian",
+    "lv": "latvian", "bn": "bengali", "sr": "serbian", "az": "azerbaijani", "sl": "slovenian", "kn": "kannada",
+    "et": "estonian", "mk": "macedonian", "br": "breton", "eu": "basque", "is": "icelandic", "hy": "armenian",
+    "ne": "nepali", "mn": "mongolian", "bs": "bosnian", "kk": "kazakh", "sq": "albanian", "sw": "swahili",
+    "gl": "galician", "mr": "marathi", "pa": "punjabi", "si": "sinhala", "km": "khmer", "sn": "shona",
+    "yo": "yoruba", "so": "somali", "af": "afrikaans", "oc": "occitan", "ka": "georgian", "be": "belarusian",
+    "tg": "tajik", "sd": "sindhi", "gu": "gujarati", "am": "amharic", "yi": "yiddish", "lo": "lao",
+    "uz": "uzbek", "fo": "faroese", "ht": "haitian creole", "ps": "pashto", "tk": "turkmen", "nn": "nynorsk",
+    "mt": "maltese", "sa": "sanskrit", "lb": "luxembourgish", "my": "myanmar", "bo": "tibetan",
+    "tl": "tagalog", "mg": "malagasy", "as": "assamese", "tt": "tatar", "haw": "hawaiian", "ln": "lingala",
+    "ha": "hausa", "ba": "bashkir", "jw": "javanese", "su": "sundanese", "yue": "cantonese",
+}
+_WHISPER_CODES = {name: code for code, name in WHISPER_LANGUAGES.items()}
+
+
+def language_code(language):
+    """Code for a language as Whisper reports it ("Marathi" or "mr"); None if unknown"""
+    language = (language or "").strip().lower()
+    if language in WHISPER_LANGUAGES:
+        return language
+    return _WHISPER_CODES.get(language)
+
+
+def language_name(code):
+    """"Marathi" for "mr"; unknown codes are returned as is"""
+    return WHISPER_LANGUAGES.get(code, code).title()
+
+
+def reply_language(text, spoken=None):
+    """Language code to reply in for a transcribed utterance.
+
+    spoken is the language Whisper detected. Whisper labels Hinglish as either
+    Hindi or English, so between those two the lexicon decides; any other
+    language (e.g. Marathi, Tamil) is replied to in that language.
+    """
+    code = language_code(spoken)
+    if code is None or code in ("hi", "en"):
+        return detect_language(text)
+    return code
+
+
+@lru_cache(maxsize=4096)
+def detect_language(text):
+    """'hi' or 'en' for a piece of user text"""
+    if not text:
+        return "en"
+
+    devanagari = len(DEVANAGARI.findall(text))
+    if devanagari:
+        letters = len(LETTER.findall(text))
+        if devanagari / max(letters, 1) >= DEVANAGARI_RATIO:
+            return "hi"
+
+    hinglish = english = 0
+    for token in TOKEN.findall(text.lower()):
+        if token in HINGLISH_WORDS:
+            hinglish += 1
+        elif token in ENGLISH_WORDS:
+            english += 1
+
+    if hinglish and hinglish / (hinglish + english) >= HINGLISH_SHARE:
+        return "hi"
+    return "en"
@@ -0,0 +1,24 @@
+# lazy.py
+import threading
+
+
+class LazyClient:
+    """Stands in for a client and builds it on first attribute access.
+
+    Keeps heavy SDK imports and client construction out of module import time.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
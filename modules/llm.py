@@ -0,0 +1,217 @@
+# llm.py
+# Chat completions with a deadline: bounded retries with jittered backoff,
+# optional hedged duplicate requests, and fallback to a faster model when the
+# primary is not expected to answer in the time left. Decisions are driven by
+# a rolling latency window per model.
+#
+# Models named "ollama:<name>" are served by the local Ollama instead of Groq.
+
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from prometheus_client import Counter, Histogram
+from modules.lazy import LazyClient
+
+# Default time budget for one generation, retries and fallbacks included
+DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "20"))
+# Attempts per generation (first call included)
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE_S = float(os.getenv("LLM_BACKOFF_BASE_S", "0.25"))
+# Send a duplicate request when the first is slower than the model's p95
+HEDGING = os.getenv("LLM_HEDGING", "0").lower() in ("1", "true", "yes")
+HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "0.2"))
+# Latency samples required before p95 is trusted for hedging and fallback
+MIN_SAMPLES = int(os.getenv("LLM_MIN_SAMPLES", "20"))
+
+# Next faster model to try when a model is at risk of missing the deadline
+FALLBACKS = {
+    "llama3-70b-8192": "llama3-8b-8192",
+}
+# e.g. "ollama:llama3.2" to fall back from the smallest Groq model to the local one
+LOCAL_FALLBACK = os.getenv("LLM_LOCAL_FALLBACK", "")
+if LOCAL_FALLBACK:
+    FALLBACKS.setdefault("llama3-8b-8192", LOCAL_FALLBACK)
+
+LLM_LATENCY = Histogram(
+    "voicebot_llm_duration_seconds",
+    "Duration of individual LLM calls",
+    ["model", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0),
+)
+LLM_EVENTS = Counter(
+    "voicebot_llm_events_total",
+    "Retries, hedges, fallbacks and deadline misses",
+    ["model", "event"],
+)
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMDeadlineExceeded(LLMError):
+    pass
+
+
+# ===================== Latency Stats =====================
+class ModelLatencyStats:
+    """Rolling window of recent call durations per model"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model, pct):
+        """None until the model has MIN_SAMPLES samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def snapshot(self):
+        with self._lock:
+            models = list(self._samples)
+        return {
+            model: {"p50_s": self.percentile(model, 50), "p95_s": self.percentile(model, 95), "samples": len(self._samples[model])}
+            for model in models
+        }
+
+
+latency_stats = ModelLatencyStats()
+
+
+# ===================== Backends =====================
+def _create_groq():
+    from groq import Groq
+    # Retries are done here, within the deadline, not by the SDK
+    return Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+
+groq_client = LazyClient(_create_groq)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_WORKERS", "32")), thread_name_prefix="llm")
+
+
+def _call_model(messages, model, temperature, timeout):
+    start = time.perf_counter()
+    try:
+        if model.startswith("ollama:"):
+            from langchain_ollama import ChatOllama
+            llm = ChatOllama(model=model.split(":", 1)[1], temperature=temperature, client_kwargs={"timeout": timeout})
+            content = llm.invoke(messages).content
+        else:
+            completion = groq_client.chat.completions.create(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                timeout=timeout,
+            )
+            content = completion.choices[0].message.content
+    except Exception:
+        elapsed = time.perf_counter() - start
+        LLM_LATENCY.labels(model, "error").observe(elapsed)
+        raise
+    elapsed = time.perf_counter() - start
+    LLM_LATENCY.labels(model, "ok").observe(elapsed)
+    latency_stats.record(model, elapsed)
+    return content
+
+
+def is_retriable(error):
+    """Timeouts, connection errors, rate limits and 5xx are worth another try"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in ("APITimeoutError", "APIConnectionError", "ReadTimeout", "ConnectTimeout"):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+# ===================== Model Choice =====================
+def choose_model(model, remaining):
+    """The first model in model's fallback chain whose p95 fits in the remaining time"""
+    candidate = model
+    while True:
+        p95 = latency_stats.percentile(candidate, 95)
+        fallback = FALLBACKS.get(candidate)
+        if p95 is None or p95 <= remaining or fallback is None:
+            return candidate
+        LLM_EVENTS.labels(candidate, "fallback").inc()
+        candidate = fallback
+
+
+def hedge_delay(model, remaining):
+    p95 = latency_stats.percentile(model, 95)
+    if not HEDGING or p95 is None:
+        return None
+    delay = max(HEDGE_MIN_DELAY_S, p95)
+    return delay if delay < remaining else None
+
+
+# ===================== Completion =====================
+def complete(messages, model="llama3-8b-8192", temperature=0.7, deadline_s=None):
+    """Text of a chat completion for Groq-format messages, within deadline_s seconds.
+
+    Blocks until done (up to the deadline): call it from a thread, not the event loop.
+    Raises LLMDeadlineExceeded when no model answered in time, LLMError otherwise.
+    """
+    deadline = time.monotonic() + (deadline_s or DEADLINE_S)
+    last_error = None
+
+    for attempt in range(MAX_ATTEMPTS):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if attempt:
+            LLM_EVENTS.labels(model, "retry").inc()
+        current = choose_model(model, remaining)
+
+        futures = {_executor.submit(_call_model, messages, current, temperature, remaining): current}
+        delay = hedge_delay(current, remaining)
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                # Hedge on whichever model is expected to make the deadline now
+                hedge_model = choose_model(current, deadline - time.monotonic())
+                LLM_EVENTS.labels(hedge_model, "hedge").inc()
+                futures[_executor.submit(_call_model, messages, hedge_model, temperature, deadline - time.monotonic())] = hedge_model
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    # Losing calls finish in the background (bounded by their own timeout)
+                    return future.result()
+                last_error = future.exception()
+
+        if pending:
+            # Deadline hit with calls still running
+            break
+        if not is_retriable(last_error):
+            raise LLMError(str(last_error)) from last_error
+        if attempt == MAX_ATTEMPTS - 1:
+            # No attempt left to wait for
+            continue
+
+        # Full jitter, never sleeping past the deadline
+        backoff = random.uniform(0, BACKOFF_BASE_S * 2 ** attempt)
+        if time.monotonic() + backoff >= deadline:
+            break
+        time.sleep(backoff)
+    else:
+        raise LLMError(f"{model} failed after {MAX_ATTEMPTS} attempts: {last_error}") from last_error
+
+    LLM_EVENTS.labels(model, "deadline_exceeded").inc()
+    raise LLMDeadlineExceeded(f"No response from {model} within {deadline_s or DEADLINE_S:.1f}s" +
+                              (f" (last error: {last_error})" if last_error else ""))
@@ -0,0 +1,137 @@
+# metrics.py
+# Per-request stage spans, exported as Prometheus histograms.
+
+import os
+import json
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger("voicebot.trace")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    "voicebot_stage_duration_seconds",
+    "Duration of each stage of a request",
+    ["endpoint", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "voicebot_request_duration_seconds",
+    "End-to-end request duration",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+AUDIO_BYTES = Histogram(
+    "voicebot_audio_bytes",
+    "Size of voice audio before and after preprocessing",
+    ["stage"],
+    buckets=(16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 32e6),
+)
+AUDIO_SECONDS_TRIMMED = Counter(
+    "voicebot_audio_trimmed_seconds",
+    "Seconds of silence trimmed from voice audio before transcription",
+)
+TRANSCRIPTION_SECONDS_SAVED = Counter(
+    "voicebot_transcription_saved_seconds",
+    "Estimated transcription time saved by sending less audio",
+)
+
+REQUEST_ID_HEADER = "x-request-id"
+
+_current_trace = ContextVar("current_trace", default=None)
+
+
+# ===================== Request Traces =====================
+class RequestTrace:
+    def __init__(self, request_id, scope):
+        self.request_id = request_id
+        self.scope = scope
+        self.spans = []
+
+    @property
+    def endpoint(self):
+        # Set by the router once the request has been matched
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+def current_request_id():
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(stage):
+    """Time a block as one stage of the current request"""
+    trace = _current_trace.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(trace.endpoint if trace else "none", stage).observe(elapsed)
+        if trace is not None:
+            trace.spans.append({"stage": stage, "ms": round(elapsed * 1000, 2)})
+
+
+# ===================== ASGI Middleware =====================
+class RequestTracingMiddleware:
+    """Assigns a request id, echoes it in the response and records the request's spans"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(REQUEST_ID_HEADER.encode(), b"").decode() or uuid.uuid4().hex
+        trace = RequestTrace(request_id, scope)
+        token = _current_trace.set(trace)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER.encode(), request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_trace.reset(token)
+            REQUEST_LATENCY.labels(trace.endpoint, scope["method"], str(status["code"])).observe(elapsed)
+            logger.info(json.dumps({
+                "request_id": request_id,
+                "endpoint": trace.endpoint,
+                "status": status["code"],
+                "duration_ms": round(elapsed * 1000, 2),
+                "spans": trace.spans,
+            }))
+
+
+# ===================== Exposition =====================
+def render_metrics():
+    """Latest metrics in the Prometheus text format, aggregated across workers if multiprocess mode is on"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,163 @@
+# profiling.py
+# Opt-in profiling of selected live requests.
+#
+# PROFILE_ENABLED=1 turns it on. A request is profiled when it carries the
+# X-Profile header or is picked by PROFILE_SAMPLE_RATE (in PROFILE_MODE).
+#   stack    -> sampled call stacks of every thread in collapsed format (<name>.folded), for flamegraph.pl / speedscope
+#   cprofile -> deterministic profile (<name>.prof), for snakeviz / pstats. Covers the event-loop thread
+#               only, not work handed to asyncio.to_thread, so it can only be chosen with PROFILE_MODE
+# Output goes to PROFILE_DIR and the oldest files are deleted once it exceeds PROFILE_MAX_BYTES.
+
+import os
+import sys
+import time
+import random
+import asyncio
+import cProfile
+import threading
+from collections import Counter
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_TOKEN_HEADER = b"x-profile-token"
+PROFILE_FILE_HEADER = b"x-profile-file"
+MODES = ("stack", "cprofile")
+# The only mode that sees the blocking work the endpoints run in worker threads
+HEADER_MODE = "stack"
+
+# Innermost frames of threads that are parked, not working
+IDLE_FUNCTIONS = {"wait", "select", "poll", "accept", "_wait_for_tstate_lock", "_worker"}
+
+
+def profiling_enabled():
+    return os.getenv("PROFILE_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+# ===================== Stack Sampler =====================
+class StackSampler:
+    """Samples the stacks of all busy threads at a fixed interval"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ===================== Output Budget =====================
+def enforce_disk_budget(directory, max_bytes):
+    """Delete the oldest profiles until the directory fits in max_bytes"""
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+# ===================== ASGI Middleware =====================
+class ProfilingMiddleware:
+    """Profiles selected requests; at most one profile runs at a time.
+
+    Stack sampling covers the whole process while the request is in flight, so
+    concurrent requests show up in the output too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.default_mode = os.getenv("PROFILE_MODE", "stack")
+        self.token = os.getenv("PROFILE_TOKEN", "")
+        self.directory = os.getenv("PROFILE_DIR", "profiles")
+        self.max_bytes = int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+        self._busy = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _select_mode(self, scope):
+        headers = dict(scope.get("headers") or [])
+        requested = headers.get(PROFILE_HEADER, b"").decode().lower()
+        if requested:
+            if self.token and headers.get(PROFILE_TOKEN_HEADER, b"").decode() != self.token:
+                return None
+            return HEADER_MODE
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.default_mode
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        mode = self._select_mode(scope)
+        if mode is None or not self._busy.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        slug = scope["path"].strip("/").replace("/", "_")[:60] or "root"
+        extension = "prof" if mode == "cprofile" else "folded"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{slug}.{extension}")
+
+        async def send_with_profile_file(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_FILE_HEADER, os.path.basename(path).encode())]
+            await send(message)
+
+        profiler = cProfile.Profile() if mode == "cprofile" else StackSampler(self.interval)
+        try:
+            if mode == "cprofile":
+                profiler.enable()
+            else:
+                profiler.start()
+            try:
+                await self.app(scope, receive, send_with_profile_file)
+            finally:
+                if mode == "cprofile":
+                    profiler.disable()
+                else:
+                    profiler.stop()
+            try:
+                await asyncio.to_thread(self._write, profiler, mode, path)
+            except OSError as e:
+                print("❌ Error writing profile:", e)
+        finally:
+            self._busy.release()
+
+    def _write(self, profiler, mode, path):
+        if mode == "cprofile":
+            profiler.dump_stats(path)
+        else:
+            profiler.dump(path)
+        enforce_disk_budget(self.directory, self.max_bytes)
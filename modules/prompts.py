@@ -0,0 +1,142 @@
+# prompts.py
+# Prompt registry. Each assistant's static prefix (system prompt + greeting
+# exchange) is compiled once and reused as the very same messages on every
+# turn, so it stays byte-identical and provider-side prefix caching can apply.
+# Only the retrieved context, language instructions and the user turn are
+# appended per request.
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from prometheus_client import Counter, Histogram
+from modules.language_id import language_name
+
+# The LenDenClub relationship-manager prompt used by the Streamlit app, the CLI voice loop and the test runner
+LENDENCLUB_SYSTEM_PROMPT = """You are a "Relationship Manager" named Satyajit working at Lenden Club, you are trained to support users with Lenden Club related queries , AND NOTHING ELSE. Lenden Club is a peer-to-peer (P2P) lending platform. Your job is to help with the following three tasks for LenDenClub Customers, India's largest P2P lending platform.
+
+When responding to queries about P2P lending or LenDenClub, always follow these guidelines:
+
+1) Help with Initial Onboarding:
+- Explain platform features simply
+- Mention fund diversification starts from ₹100
+- State max lending amount is ₹10 Lakhs
+- Highlight escrow safety with ICICI Trusteeship
+- Share expected returns (~11.33% p.a.)
+- Explain borrower verification (600+ data points)
+- Mention 95.6% on-time repayment rate
+
+2) Explain Key Terms (simple definitions):
+- P2P Lending: Direct lending between individuals via platform
+- AUM (₹1,023 Cr): Total money managed by platform
+- NPA (3.78%): Loans not repaid on time
+- Escrow: Protected account managed by ICICI Trusteeship
+- Diversification: Spreading ₹100+ across multiple loans
+- EMI: Monthly installment payments
+- Interest vs Returns: What borrowers pay vs lenders earn
+- InstaMoney: LenDenClub's app (3Cr+ downloads)
+
+3) Risk Management:
+- Clearly state: "P2P lending carries risks"
+- Mention RBI regulates the platform (NBFC-P2P)
+- Explain 3.78% NPA means some loans may default
+- Stress importance of diversification
+- Highlight escrow protection
+- Note 95.6% repayment rate
+- Mention zero principal loss since launch
+
+Always use the latest platform data (Dec 2024):
+- 2Cr+ users, ₹16,011Cr total lent
+- 85% personal, 15% merchant loans
+- RBI registered (Innofin Solutions Pvt Ltd)
+"""
+
+# Single-message template for the LangChain chains ({context} and {question} come last)
+LENDENCLUB_TEMPLATE = LENDENCLUB_SYSTEM_PROMPT + """
+Relevant Documents:
+{context}
+
+User Query:
+{question}
+"""
+
+HINDI_INSTRUCTIONS = """Important Instructions:
+1. You must respond in Hindi language only.
+2. Use simple Hindi words that are easy to understand.
+3. If you don't know a Hindi word, explain the concept in simple Hindi.
+4. Never respond in English."""
+
+PROMPT_BUILD_SECONDS = Histogram(
+    "voicebot_prompt_build_seconds",
+    "Time to build the messages for one turn",
+    buckets=(1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05),
+)
+PROMPT_PREFIX_LOOKUPS = Counter(
+    "voicebot_prompt_prefix_total",
+    "Compiled prefix lookups: hit (reused) or compile (new or changed assistant config)",
+    ["outcome"],
+)
+
+
+def language_messages(language):
+    """Instructions appended after the prefix so the reply is in the given language"""
+    if language == "en":
+        return []
+    if language == "hi":
+        return [
+            {"role": "system", "content": HINDI_INSTRUCTIONS},
+            {"role": "human", "content": "कृपया हिंदी में ही उत्तर दें।"},
+        ]
+    return [{"role": "system", "content": f"Important: You must respond in {language_name(language)} language only."}]
+
+
+# ===================== Compiled Prompts =====================
+class CompiledPrompt:
+    def __init__(self, system_prompt, first_message):
+        self.prefix = (
+            {"role": "system", "content": system_prompt},
+            {"role": "human", "content": "Hello!"},
+            {"role": "ai", "content": first_message},
+        )
+        self.fingerprint = fingerprint(system_prompt, first_message)
+
+    def build(self, user_input, context="", language="en"):
+        """Messages for one turn: the shared prefix, then context, language instructions and the user turn"""
+        start = time.perf_counter()
+        messages = list(self.prefix)
+        if context:
+            messages.append({"role": "system", "content": f"Context:\n{context}"})
+        messages.extend(language_messages(language))
+        messages.append({"role": "human", "content": user_input})
+        PROMPT_BUILD_SECONDS.observe(time.perf_counter() - start)
+        return messages
+
+
+def fingerprint(system_prompt, first_message):
+    return hashlib.sha256(f"{system_prompt}\0{first_message}".encode()).hexdigest()
+
+
+class PromptRegistry:
+    def __init__(self, max_prompts=10000):
+        self.max_prompts = max_prompts
+        self._prompts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, assistant_id, system_prompt, first_message):
+        """Compiled prompt for an assistant, recompiled only when its prompt or greeting changes"""
+        key = fingerprint(system_prompt, first_message)
+        with self._lock:
+            prompt = self._prompts.get(assistant_id)
+            if prompt is not None and prompt.fingerprint == key:
+                self._prompts.move_to_end(assistant_id)
+                PROMPT_PREFIX_LOOKUPS.labels("hit").inc()
+                return prompt
+            prompt = self._prompts[assistant_id] = CompiledPrompt(system_prompt, first_message)
+            self._prompts.move_to_end(assistant_id)
+            if len(self._prompts) > self.max_prompts:
+                self._prompts.popitem(last=False)
+        PROMPT_PREFIX_LOOKUPS.labels("compile").inc()
+        return prompt
+
+
+prompt_registry = PromptRegistry()
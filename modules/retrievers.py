@@ -0,0 +1,22 @@
+# retrievers.py
+# Chroma retriever for an assistant/session store that records every use of
+# the store, so a retriever kept across requests (e.g. in a Streamlit session)
+# keeps its store hot instead of letting it be evicted to cold storage.
+
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+from modules.context_store import ensure_available
+
+
+class StoreRetriever(VectorStoreRetriever):
+    store: str
+
+    def _get_relevant_documents(self, query: str, *, run_manager, **kwargs: Any) -> List[Document]:
+        ensure_available(self.store)
+        return super()._get_relevant_documents(query, run_manager=run_manager, **kwargs)
+
+    def search_by_vector(self, embedding) -> List[Document]:
+        """Same search for an already embedded query"""
+        ensure_available(self.store)
+        return self.vectorstore.similarity_search_by_vector(embedding, **self.search_kwargs)
@@ -1,17 +1,6 @@
-import os
 from collections import defaultdict
-from supabase import create_client, Client
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
-
-# ===================== Load Environment =====================
-load_dotenv()
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from functools import lru_cache
+from modules.supabase_client import supabase
 
 # ===================== Fetching Chat Data =====================
 def get_all_conversations():
@@ -29,9 +18,7 @@ def group_by_session(chat_data):
     return sessions
 
 # ===================== LLM Setup =====================
-llm = ChatGroq(model="llama3-70b-8192", temperature=0.3)  # Updated to more powerful model
-
-sentiment_prompt = ChatPromptTemplate.from_template("""
+SENTIMENT_PROMPT = """
 Analyze this conversation and classify the user's overall sentiment. 
 Choose ONLY ONE of these labels:
 - Good (positive/happy/satisfied)
@@ -42,20 +29,28 @@ Choose ONLY ONE of these labels:
 Conversation:
 {chat_history}
 
-Sentiment:""")
-
-sentiment_chain = sentiment_prompt | llm
+Sentiment:"""
 
 # ===================== Optional Reason Chain =====================
-reason_prompt = ChatPromptTemplate.from_template("""
+REASON_PROMPT = """
 The user in this conversation showed dissatisfaction. 
 Provide a concise one-line explanation of why they might be unhappy.
 
 Conversation:
 {chat_history}
 
-Reason:""")
-reason_chain = reason_prompt | llm
+Reason:"""
+
+@lru_cache(maxsize=None)
+def get_chains():
+    """Build the LLM and both chains on first use"""
+    from langchain_groq import ChatGroq
+    from langchain_core.prompts import ChatPromptTemplate
+
+    llm = ChatGroq(model="llama3-70b-8192", temperature=0.3)  # Updated to more powerful model
+    sentiment_chain = ChatPromptTemplate.from_template(SENTIMENT_PROMPT) | llm
+    reason_chain = ChatPromptTemplate.from_template(REASON_PROMPT) | llm
+    return sentiment_chain, reason_chain
 
 # ===================== Analyze Sentiment for a Session =====================
 def analyze_session_sentiment(session_id, session_conversation):
@@ -66,6 +61,7 @@ def analyze_session_sentiment(session_id, session_conversation):
     for turn in session_conversation:
         full_dialogue += f"User: {turn['user']}\nBot: {turn['bot']}\n\n"
 
+    sentiment_chain, reason_chain = get_chains()
     result = sentiment_chain.invoke({"chat_history": full_dialogue})
     response = result.content.strip()
     
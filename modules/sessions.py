@@ -0,0 +1,199 @@
+# sessions.py
+# Session allocation and an index of the session/assistant directories under
+# Context/. Ids come from a counter in a small sqlite file (Context/_index.sqlite3),
+# so concurrent creates in any number of processes never get the same
+# session_N, and listing reads an in-memory copy of the index instead of
+# scanning the directory. The copy is reloaded only when another connection
+# has committed a change (PRAGMA data_version).
+#
+# The index also records when each store was last used and whether it is
+# hot (under Context/) or evicted to cold storage (see modules/context_store.py).
+
+import os
+import time
+import bisect
+import sqlite3
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+INDEX_FILE = "_index.sqlite3"
+
+# Last-access writes per store are at most this often (per process)
+TOUCH_INTERVAL_S = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS contexts (name TEXT PRIMARY KEY, kind TEXT NOT NULL, created_at TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS stores (
+    name TEXT PRIMARY KEY, last_access REAL NOT NULL, tier TEXT NOT NULL DEFAULT 'hot', rehydrate_ms REAL
+);
+"""
+
+
+def context_kind(name):
+    for kind in ("session", "assistant"):
+        if name.startswith(f"{kind}_"):
+            return kind
+    return None
+
+
+class ContextIndex:
+    def __init__(self, context_root="Context"):
+        self.context_root = context_root
+        os.makedirs(context_root, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(context_root, INDEX_FILE),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+        self._version = None
+        self._names = {"session": [], "assistant": []}
+        self._touched = {}
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+            with self._transaction():
+                if self._conn.execute("SELECT 1 FROM counters WHERE name = 'session'").fetchone() is None:
+                    self._import_existing()
+            self._refresh()
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front: other processes queue on it (up to `timeout`)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _import_existing(self):
+        """First use on an existing Context/: index what is already on disk (the only directory scan)"""
+        highest = 0
+        now = datetime.utcnow().isoformat()
+        for name in os.listdir(self.context_root):
+            kind = context_kind(name)
+            if kind is None or not os.path.isdir(os.path.join(self.context_root, name)):
+                continue
+            self._conn.execute("INSERT OR IGNORE INTO contexts VALUES (?, ?, ?)", (name, kind, now))
+            suffix = name.split("_", 1)[1]
+            if kind == "session" and suffix.isdigit():
+                highest = max(highest, int(suffix))
+        self._conn.execute("INSERT INTO counters VALUES ('session', ?)", (highest,))
+
+    def _refresh(self):
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+        names = {"session": [], "assistant": []}
+        for name, kind in self._conn.execute("SELECT name, kind FROM contexts ORDER BY name"):
+            names.setdefault(kind, []).append(name)
+        self._names = names
+        self._version = version
+
+    def _add(self, name, kind):
+        names = self._names.setdefault(kind, [])
+        position = bisect.bisect_left(names, name)
+        if position == len(names) or names[position] != name:
+            names.insert(position, name)
+
+    # ===================== Public API =====================
+    def allocate_session(self):
+        """Reserve the next session_N and create its directory"""
+        with self._lock:
+            self._refresh()
+            with self._transaction():
+                while True:
+                    self._conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'session'")
+                    value = self._conn.execute("SELECT value FROM counters WHERE name = 'session'").fetchone()[0]
+                    name = f"session_{value}"
+                    # Skip ids taken by directories created outside the index
+                    if not os.path.exists(os.path.join(self.context_root, name)):
+                        break
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO contexts VALUES (?, 'session', ?)", (name, datetime.utcnow().isoformat())
+                )
+                os.makedirs(os.path.join(self.context_root, name))
+            self._add(name, "session")
+            return name
+
+    def register(self, name):
+        """Add a directory created elsewhere (e.g. assistant_<uuid>) to the index"""
+        kind = context_kind(name)
+        if kind is None:
+            raise ValueError(f"Not a session or assistant directory name: {name}")
+        with self._lock:
+            self._refresh()
+            with self._transaction():
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO contexts VALUES (?, ?, ?)", (name, kind, datetime.utcnow().isoformat())
+                )
+            self._add(name, kind)
+
+    def names(self, kind):
+        with self._lock:
+            self._refresh()
+            return list(self._names.get(kind, []))
+
+    # ===================== Store Lifecycle =====================
+    def touch(self, name, force=False):
+        """Record that a store was used (throttled to one write per TOUCH_INTERVAL_S)"""
+        now = time.time()
+        if not force and now - self._touched.get(name, 0) < TOUCH_INTERVAL_S:
+            return
+        self._touched[name] = now
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO stores (name, last_access) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET last_access = excluded.last_access",
+                (name, now),
+            )
+
+    def set_tier(self, name, tier, rehydrate_ms=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO stores (name, last_access, tier, rehydrate_ms) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tier = excluded.tier, "
+                "rehydrate_ms = COALESCE(excluded.rehydrate_ms, stores.rehydrate_ms)",
+                (name, time.time(), tier, rehydrate_ms),
+            )
+
+    def store_states(self):
+        """{name: {"last_access", "tier", "rehydrate_ms"}} for every store used since tracking began"""
+        with self._lock:
+            rows = self._conn.execute("SELECT name, last_access, tier, rehydrate_ms FROM stores").fetchall()
+        return {
+            name: {"last_access": last_access, "tier": tier, "rehydrate_ms": rehydrate_ms}
+            for name, last_access, tier, rehydrate_ms in rows
+        }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_context_index(context_root="Context"):
+    with _indexes_lock:
+        index = _indexes.get(context_root)
+        if index is None:
+            index = _indexes[context_root] = ContextIndex(context_root)
+        return index
+
+
+def get_next_session_id(context_root="Context"):
+    return get_context_index(context_root).allocate_session()
+
+
+def list_sessions(context_root="Context"):
+    return get_context_index(context_root).names("session")
+
+
+def list_assistants(context_root="Context"):
+    return get_context_index(context_root).names("assistant")
+
+
+def register_context(name, context_root="Context"):
+    get_context_index(context_root).register(name)
@@ -0,0 +1,121 @@
+# speculation.py
+# Speculative retrieval: start vector retrieval on a stable prefix of an
+# utterance while the rest is still being transcribed, and keep the result
+# if the final transcript's embedding is close enough to the prefix's.
+
+import os
+import time
+import asyncio
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import Counter, Histogram
+
+# Cosine similarity between the prefix and final query embeddings above which the prefix's results are kept
+MIN_SIMILARITY = float(os.getenv("SPECULATION_MIN_SIMILARITY", "0.95"))
+
+SPECULATION_OUTCOMES = Counter(
+    "voicebot_speculative_retrieval_total",
+    "Speculative retrieval outcomes: hit (reused), match (discarded but would have been right), miss, none",
+    ["outcome"],
+)
+SPECULATION_SAVED_SECONDS = Counter(
+    "voicebot_speculative_retrieval_saved_seconds",
+    "Retrieval time hidden behind transcription by speculation",
+)
+SPECULATION_SIMILARITY = Histogram(
+    "voicebot_speculative_retrieval_similarity",
+    "Cosine similarity of the prefix and final query embeddings",
+    buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.98, 0.99, 1.0),
+)
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculation")
+
+
+def cosine_similarity(a, b):
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    return float(a @ b / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
+
+
+def doc_keys(docs):
+    return {doc.page_content for doc in docs}
+
+
+def submit_in_slot(make_slot, loop):
+    """submit() for SpeculativeRetriever that runs each retrieval inside an admission slot (make_slot()).
+
+    The slot is awaited on the event loop, so a queued retrieval holds no thread.
+    """
+    async def run(fn, *args):
+        async with make_slot():
+            return await asyncio.to_thread(fn, *args)
+
+    return lambda fn, *args: asyncio.run_coroutine_threadsafe(run(fn, *args), loop)
+
+
+class SpeculativeRetriever:
+    """Speculative retrieval for one utterance, from embed(text) -> vector and search(vector) -> docs.
+
+    Call speculate() with a prefix known to be final (e.g. the audio before the
+    last pause) and await finalize() with the full transcript. The final query
+    is embedded either way; the prefix's results are reused when the cosine
+    similarity of the two embeddings is at least min_similarity.
+    Every embedding and search goes through submit(fn, *args) -> Future (see submit_in_slot).
+    """
+
+    def __init__(self, embed, search, min_words=3, min_similarity=MIN_SIMILARITY, submit=None):
+        self.embed = embed
+        self.search = search
+        self.submit = submit or _executor.submit
+        self.min_words = min_words
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._future = None
+        self._duration = None
+
+    # ===================== Speculation =====================
+    def speculate(self, prefix_text):
+        if len((prefix_text or "").split()) < self.min_words:
+            return
+        with self._lock:
+            self._future = self.submit(self._embed_and_search, prefix_text)
+
+    def _embed_and_search(self, query):
+        vector = self.embed(query)
+        start = time.perf_counter()
+        docs = self.search(vector)
+        self._duration = time.perf_counter() - start
+        return vector, docs
+
+    # ===================== Final Transcript =====================
+    async def finalize(self, final_text):
+        """Returns (docs, outcome) for the final transcript; waits without holding a thread"""
+        with self._lock:
+            future = self._future
+
+        if future is None:
+            SPECULATION_OUTCOMES.labels("none").inc()
+            _, docs = await asyncio.wrap_future(self.submit(self._embed_and_search, final_text))
+            return docs, "none"
+
+        vector = await asyncio.wrap_future(self.submit(self.embed, final_text))
+        wait_start = time.perf_counter()
+        try:
+            prefix_vector, speculative_docs = await asyncio.wrap_future(future)
+        except Exception:
+            prefix_vector, speculative_docs = None, None
+
+        if speculative_docs is not None:
+            similarity = cosine_similarity(vector, prefix_vector)
+            SPECULATION_SIMILARITY.observe(similarity)
+            if similarity >= self.min_similarity:
+                waited = time.perf_counter() - wait_start
+                SPECULATION_OUTCOMES.labels("hit").inc()
+                SPECULATION_SAVED_SECONDS.inc(max(0.0, (self._duration or 0.0) - waited))
+                return speculative_docs, "hit"
+
+        docs = await asyncio.wrap_future(self.submit(self.search, vector))
+        # Would the speculative result have been right anyway? Tells us whether min_similarity is too strict
+        outcome = "match" if speculative_docs is not None and doc_keys(speculative_docs) == doc_keys(docs) else "miss"
+        SPECULATION_OUTCOMES.labels(outcome).inc()
+        return docs, outcome
@@ -1,14 +1,18 @@
 # supabase_client.py
-from supabase import create_client
 import os
 from dotenv import load_dotenv
+from modules.lazy import LazyClient
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def _create_supabase():
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+supabase = LazyClient(_create_supabase)
 
 def save_conversation(session_id, user_query, bot_response):
     session_number = int(session_id.replace("session_", ""))  # Extract numeric part
@@ -0,0 +1,136 @@
+# vad.py
+# Frame-level voice activity detection on 16-bit mono PCM, shared by the
+# microphone loop (asr_module) and server-side preprocessing of uploads (audio).
+
+import os
+import numpy as np
+
+FRAME_MS = 30
+# Silence after speech that ends an utterance
+END_OF_UTTERANCE_MS = int(os.getenv("VAD_END_SILENCE_MS", "600"))
+# Speech needed before an utterance counts as started (ignores clicks)
+SPEECH_START_MS = 90
+# A frame is speech when its RMS is this many times the noise floor
+THRESHOLD_FACTOR = float(os.getenv("VAD_THRESHOLD_FACTOR", "3.0"))
+# RMS floor so digital silence doesn't make every small sound "speech"
+MIN_ENERGY = 100.0
+# Trimming only removes frames quieter than this, however loud the rest of the clip is
+SILENCE_DBFS = float(os.getenv("VAD_SILENCE_DBFS", "-45"))
+# How fast the noise floor follows the room while nobody is speaking
+NOISE_ADAPT_RATE = 0.05
+
+
+def frame_energies(pcm, frame_bytes):
+    """RMS energy of each whole frame of 16-bit PCM"""
+    samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % frame_bytes], dtype=np.int16)
+    frames = samples.reshape(-1, frame_bytes // 2).astype(np.float32)
+    return np.sqrt(np.mean(frames * frames, axis=1)) if len(frames) else np.zeros(0, dtype=np.float32)
+
+
+def dbfs_to_energy(dbfs):
+    """RMS of 16-bit PCM at a level relative to full scale"""
+    return 32768.0 * 10 ** (dbfs / 20)
+
+
+def energy(frame):
+    """RMS energy of one frame of 16-bit PCM (any length)"""
+    samples = np.frombuffer(frame[:len(frame) - len(frame) % 2], dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+
+class VoiceActivityDetector:
+    def __init__(self, sample_rate=16000, frame_ms=FRAME_MS, threshold_factor=THRESHOLD_FACTOR,
+                 end_silence_ms=END_OF_UTTERANCE_MS, speech_start_ms=SPEECH_START_MS):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * 2
+        self.threshold_factor = threshold_factor
+        self.start_frames = max(1, speech_start_ms // frame_ms)
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.noise_floor = None
+        self.reset()
+
+    # ===================== Calibration =====================
+    def calibrate(self, pcm):
+        """Set the noise floor from audio known to contain no speech"""
+        energies = frame_energies(pcm, self.frame_bytes)
+        if len(energies):
+            self.noise_floor = float(np.median(energies))
+
+    @property
+    def threshold(self):
+        return max(MIN_ENERGY, (self.noise_floor or 0.0) * self.threshold_factor)
+
+    def is_speech(self, frame):
+        return energy(frame) > self.threshold
+
+    # ===================== Streaming Endpointing =====================
+    def reset(self):
+        self.in_speech = False
+        self._speech_run = 0
+        self._silence_run = 0
+
+    def feed(self, frame):
+        """Feed one frame; returns "start" / "end" when an utterance starts / ends, else None"""
+        frame_energy = energy(frame)
+        speech = frame_energy > self.threshold
+
+        if not self.in_speech:
+            if not speech and self.noise_floor is not None:
+                self.noise_floor += NOISE_ADAPT_RATE * (frame_energy - self.noise_floor)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                self.in_speech = True
+                self._silence_run = 0
+                return "start"
+            return None
+
+        self._silence_run = 0 if speech else self._silence_run + 1
+        if self._silence_run >= self.end_frames:
+            self.reset()
+            return "end"
+        return None
+
+    # ===================== Whole-clip Analysis =====================
+    def speech_mask(self, pcm, max_threshold=None):
+        """Per-frame speech flags for a clip, ignoring runs too short to be speech.
+
+        Uncalibrated detectors take the noise floor from the clip's quietest frames.
+        Frames louder than max_threshold (RMS) always count as speech.
+        """
+        energies = frame_energies(pcm, self.frame_bytes)
+        if not len(energies):
+            return np.zeros(0, dtype=bool)
+
+        noise_floor = self.noise_floor if self.noise_floor is not None else float(np.percentile(energies, 10))
+        threshold = max(MIN_ENERGY, noise_floor * self.threshold_factor)
+        if max_threshold is not None:
+            threshold = max(MIN_ENERGY, min(threshold, max_threshold))
+        speech = (energies > threshold).astype(np.int32)
+
+        window = np.ones(self.start_frames, dtype=np.int32)
+        run_starts = (np.convolve(speech, window, mode="valid") == self.start_frames).astype(np.int32)
+        return np.convolve(run_starts, window, mode="full")[:len(speech)] > 0
+
+    def speech_bounds(self, pcm):
+        """(start_ms, end_ms) of the speech in a clip, or None if there is none.
+
+        Only frames below SILENCE_DBFS can be trimmed: in a clip of quiet speech the quietest
+        frames are speech too, and a floor taken from them would cut its start and end.
+        """
+        frames = np.flatnonzero(self.speech_mask(pcm, max_threshold=dbfs_to_energy(SILENCE_DBFS)))
+        if not len(frames):
+            return None
+        return int(frames[0]) * self.frame_ms, int(frames[-1] + 1) * self.frame_ms
+
+    def speech_segments(self, pcm, min_gap_ms=300):
+        """[(start_ms, end_ms)] of speech in a clip, split at pauses of at least min_gap_ms"""
+        frames = np.flatnonzero(self.speech_mask(pcm))
+        min_gap_frames = max(1, min_gap_ms // self.frame_ms)
+        segments = []
+        for frame in frames:
+            if segments and frame - segments[-1][1] < min_gap_frames:
+                segments[-1][1] = frame + 1
+            else:
+                segments.append([frame, frame + 1])
+        return [(int(start) * self.frame_ms, int(end) * self.frame_ms) for start, end in segments]
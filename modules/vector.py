@@ -1,42 +1,178 @@
 # vector.py
 import os
-import pandas as pd
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
-from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader, UnstructuredCSVLoader, Docx2txtLoader
-
-embeddings = OllamaEmbeddings(model="llama3.2")
-
-def load_documents(doc_dir):
-    documents = []
-    for file in os.listdir(doc_dir):
-        file_path = os.path.join(doc_dir, file)
-        if file.endswith(".pdf"):
-            loader = PyPDFLoader(file_path)
-            documents.extend(loader.load())
-        elif file.endswith(".csv"):
-            loader = UnstructuredCSVLoader(file_path)
-            documents.extend(loader.load())
-        elif file.endswith(".docx"):
-            loader = Docx2txtLoader(file_path)
-            documents.extend(loader.load())
-    return documents
+import json
+import hashlib
+import threading
+from modules.lazy import LazyClient
+from modules.chroma_pool import SHARED_VECTOR_DB_PATH, collection_name, open_vector_store, shared_mode
+
+def _create_embeddings():
+    from langchain_ollama import OllamaEmbeddings
+    return OllamaEmbeddings(model="llama3.2")
+
+embeddings = LazyClient(_create_embeddings)
+
+# "chroma" (HNSW) or "compact" (int8 scan + exact re-rank, see modules/compact_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+def get_compact_index(session_id, db):
+    from modules.compact_index import get_index_for_collection
+    return get_index_for_collection(session_id, db._collection)
+
+# Processes used to parse an assistant's documents in parallel
+DOC_LOAD_WORKERS = int(os.getenv("DOC_LOAD_WORKERS", os.cpu_count() or 1))
+
+DOCUMENT_EXTENSIONS = (".pdf", ".csv", ".docx")
+
+def load_file(file_path):
+    """Parse one PDF/CSV/DOCX file into documents; runs in a worker process"""
+    from langchain_community.document_loaders import PyPDFLoader, UnstructuredCSVLoader, Docx2txtLoader
+
+    if file_path.endswith(".pdf"):
+        loader = PyPDFLoader(file_path)
+    elif file_path.endswith(".csv"):
+        loader = UnstructuredCSVLoader(file_path)
+    elif file_path.endswith(".docx"):
+        loader = Docx2txtLoader(file_path)
+    else:
+        return []
+    return loader.load()
+
+# One pool for the life of the process, shared by all loads. Its workers start from a clean
+# forkserver (spawn on Windows) instead of forking the API with its threads, locks and clients.
+# Either way each worker imports the parent's __main__ module, so scripts that load documents
+# must keep their work under `if __name__ == "__main__":` (see run_interface.py).
+_doc_pool = None
+_doc_pool_lock = threading.Lock()
+
+def _get_doc_pool():
+    global _doc_pool
+    with _doc_pool_lock:
+        if _doc_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _doc_pool = ProcessPoolExecutor(max_workers=DOC_LOAD_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _doc_pool
+
+def _discard_doc_pool(pool):
+    global _doc_pool
+    with _doc_pool_lock:
+        if _doc_pool is pool:
+            _doc_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def load_documents(doc_dir, workers=DOC_LOAD_WORKERS):
+    from concurrent.futures.process import BrokenProcessPool
+
+    paths = [
+        os.path.join(doc_dir, file) for file in sorted(os.listdir(doc_dir))
+        if file.endswith(DOCUMENT_EXTENSIONS)
+    ]
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        return [doc for path in paths for doc in load_file(path)]
+
+    # Parsing is CPU bound: one file per process, results kept in file order
+    pool = _get_doc_pool()
+    try:
+        return [doc for docs in pool.map(load_file, paths) for doc in docs]
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge PDF): start a fresh pool next time, parse this batch here
+        _discard_doc_pool(pool)
+        return [doc for path in paths for doc in load_file(path)]
+
+def get_vector_db_for_session(session_id):
+    from langchain_chroma import Chroma
+    from modules.context_store import ensure_available
+
+    # Restores the store from cold storage if it was evicted, and records the access
+    ensure_available(session_id)
+
+    # One collection per assistant/session, in the pooled shared store or in Context/<id>/db
+    if shared_mode():
+        path = SHARED_VECTOR_DB_PATH
+    else:
+        path = f"Context/{session_id}/db"
+        os.makedirs(path, exist_ok=True)
+
+    return open_vector_store(path, collection_name(session_id), lambda client: Chroma(
+        collection_name=collection_name(session_id),
+        client=client,
+        embedding_function=embeddings
+    ))
+
+def document_id(doc):
+    """Stable id from a chunk's text and metadata, so adding the same chunk twice is a no-op"""
+    key = json.dumps([doc.page_content, doc.metadata], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def docs_signature(doc_dir):
+    entries = sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in os.scandir(doc_dir) if e.is_file())
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+
+def add_new_documents(db, documents, batch_size=500, session_id=None):
+    """Embed and add only the chunks not already in the store; returns how many were added
+
+    With a session_id, the collection's new signature is recorded for the compact index.
+    """
+    unique = {document_id(doc): doc for doc in documents}
+    ids = list(unique)
+    existing = set()
+    for offset in range(0, len(ids), batch_size):
+        existing.update(db.get(ids=ids[offset:offset + batch_size], include=[])["ids"])
+    new_ids = [id_ for id_ in ids if id_ not in existing]
+    if new_ids:
+        db.add_documents([unique[id_] for id_ in new_ids], ids=new_ids)
+    if session_id and new_ids:
+        from modules.compact_index import record_signature
+        record_signature(session_id, db._collection)
+    return len(new_ids)
 
 def initialize_vector_db_for_session(session_id):
     doc_dir = f"Context/{session_id}/docs"
-    db_path = f"Context/{session_id}/db"
-    os.makedirs(db_path, exist_ok=True)
+    db = get_vector_db_for_session(session_id)
 
-    documents = load_documents(doc_dir)
+    # Re-parse the docs only when they changed since they were last indexed
+    if os.path.isdir(doc_dir):
+        marker = f"Context/{session_id}/.indexed"
+        signature = docs_signature(doc_dir)
+        indexed = open(marker).read() if os.path.exists(marker) else None
+        if indexed != signature or not db._collection.count():
+            add_new_documents(db, load_documents(doc_dir), session_id=session_id)
+            with open(marker, "w") as f:
+                f.write(signature)
 
-    db = Chroma(
-        collection_name=f"{session_id}_collection",
-        persist_directory=db_path,
-        embedding_function=embeddings
-    )
+    # Both retrievers record each use of the store, so keeping one around keeps the store hot
+    if VECTOR_BACKEND == "compact":
+        from modules.compact_index import CompactRetriever
+        index = get_compact_index(session_id, db)
+        if index is not None:
+            return CompactRetriever(index=index, embeddings=embeddings, k=10, store=session_id, vectorstore=db)
+
+    from modules.retrievers import StoreRetriever
+    return StoreRetriever(vectorstore=db, search_kwargs={"k": 10}, store=session_id)
+
+def batch_retrieve(session_id, queries, k=10):
+    """Embed all queries in one call and run the vector search for them in bulk"""
+    from langchain_core.documents import Document
 
-    if documents:
-        db.add_documents(documents)
+    db = get_vector_db_for_session(session_id)
+    query_embeddings = embeddings.embed_documents(queries)
+
+    if VECTOR_BACKEND == "compact":
+        index = get_compact_index(session_id, db)
+        if index is not None:
+            return [index.documents_for(rows) for rows in index.search_many(query_embeddings, k=k)]
+
+    results = db._collection.query(
+        query_embeddings=query_embeddings,
+        n_results=k,
+        include=["documents", "metadatas"]
+    )
 
-    return db.as_retriever(search_kwargs={"k": 10})
+    return [
+        [Document(page_content=doc, metadata=meta or {}) for doc, meta in zip(docs, metas)]
+        for docs, metas in zip(results["documents"], results["metadatas"])
+    ]